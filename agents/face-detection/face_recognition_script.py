@@ -1,78 +1,298 @@
+import argparse
+import io
+import json
 import sys
 import os
+import socketserver
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 import requests
 import face_recognition
+import numpy as np
 from PIL import Image
 from urllib.parse import urlparse
 
 # Directory containing known faces
 KNOWN_FACES_DIR = "known_faces"
+TOLERANCE = 0.6
 
 def download_image(image_url):
-    """Downloads an image from a URL and saves it locally."""
+    """Downloads an image from a URL into memory (a file object face_recognition can load)."""
     headers = {
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
     }
     
     try:
-        response = requests.get(image_url, headers=headers, stream=True, allow_redirects=True)
+        response = requests.get(image_url, headers=headers, allow_redirects=True)
         response.raise_for_status()  # Raise error if request fails
-        
-        image_path = "input_image.jpg"
-        with open(image_path, "wb") as f:
-            for chunk in response.iter_content(1024):
-                f.write(chunk)
-        return image_path
+        return io.BytesIO(response.content)
     except requests.exceptions.RequestException as e:
         print(f"Error downloading image: {e}")
         return None
 
 def encode_known_faces():
-    """Encodes all known faces and returns a dictionary {name: encoding}."""
-    known_encodings = {}
+    """Encodes all known faces and returns (names, N x 128 encoding matrix)."""
+    names, encodings = [], []
     
-    for filename in os.listdir(KNOWN_FACES_DIR):
+    for filename in sorted(os.listdir(KNOWN_FACES_DIR)):
         filepath = os.path.join(KNOWN_FACES_DIR, filename)
         if not filename.endswith(('.jpg', '.jpeg', '.png')):
             continue
         
         name = os.path.splitext(filename)[0]  # Extract name from filename
         image = face_recognition.load_image_file(filepath)
-        encodings = face_recognition.face_encodings(image)
+        face_encodings = face_recognition.face_encodings(image)
 
-        if encodings:
-            known_encodings[name] = encodings[0]
+        if face_encodings:
+            names.append(name)
+            encodings.append(face_encodings[0])
     
-    return known_encodings
+    return names, np.array(encodings, dtype=np.float64).reshape(-1, 128)
 
-def recognize_faces(image_path, known_encodings):
-    """Compares an input image with known faces and returns the closest match."""
+def recognize_faces(image_path, known_faces):
+    """
+    Matches every face in the input image against all known faces at once.
+    Returns one entry per face: name (None if unknown), distance, margin to
+    the runner-up identity and box.
+    """
+    names, known_matrix = known_faces
     unknown_image = face_recognition.load_image_file(image_path)
-    unknown_encodings = face_recognition.face_encodings(unknown_image)
-
+    locations = face_recognition.face_locations(unknown_image)
+    unknown_encodings = face_recognition.face_encodings(unknown_image, locations)
     if not unknown_encodings:
-        return "No face detected in the input image."
+        return []
 
-    unknown_encoding = unknown_encodings[0]
-    
-    for name, known_encoding in known_encodings.items():
-        match = face_recognition.compare_faces([known_encoding], unknown_encoding, tolerance=0.6)
-        if match[0]:
-            return f"Match found: {name}"
-    
-    return "No match found."
+    probes = np.array(unknown_encodings)
+    if not names:
+        return [{"name": None, "distance": None, "margin": None, "box": box} for box in locations]
+
+    # All probe x known distances in one computation
+    distances = np.linalg.norm(probes[:, None, :] - known_matrix[None, :, :], axis=2)
+    order = np.argsort(distances, axis=1)
+    results = []
+    for face, box in enumerate(locations):
+        best = order[face, 0]
+        distance = float(distances[face, best])
+        runner_up = next((distances[face, i] for i in order[face, 1:] if names[i] != names[best]), None)
+        results.append({
+            "name": names[best] if distance <= TOLERANCE else None,
+            "distance": distance,
+            "margin": float(runner_up - distance) if runner_up is not None else None,
+            "box": box
+        })
+    return results
 
 def is_url(string):
     """Checks if the input string is a URL."""
     parsed = urlparse(string)
     return bool(parsed.netloc) and bool(parsed.scheme)
 
+def print_results(results):
+    if not results:
+        print("No face detected in the input image.")
+    for result in results:
+        if result["name"]:
+            print(f"Match found: {result['name']} (distance {result['distance']:.3f}, box {result['box']})")
+        else:
+            print(f"No match found (box {result['box']})")
+
+
+# ----- worker processes: the gallery is encoded once in the parent and handed to each worker -----
+
+_worker_faces = None
+
+
+def _init_worker(known_faces):
+    global _worker_faces
+    _worker_faces = known_faces
+
+
+def _recognize_bytes(data):
+    return recognize_faces(io.BytesIO(data), _worker_faces)
+
+
+def _recognize_path(path):
+    try:
+        return {"image": path, "faces": recognize_faces(path, _worker_faces)}
+    except Exception as e:
+        return {"image": path, "error": str(e)}
+
+
+def start_pool(workers, known_faces):
+    return ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(known_faces,))
+
+
+# ----- batch mode -----
+
+def batch_images(inputs):
+    """Image files named on the command line, directories expanded (not recursively)."""
+    for item in inputs:
+        if os.path.isdir(item):
+            for filename in sorted(os.listdir(item)):
+                if filename.lower().endswith(('.jpg', '.jpeg', '.png')):
+                    yield os.path.join(item, filename)
+        else:
+            yield item
+
+
+def run_batch(inputs, workers, known_faces):
+    """Recognize every image across a process pool; one JSON line per image, then throughput."""
+    paths = list(batch_images(inputs))
+    started = time.perf_counter()
+    with start_pool(workers, known_faces) as pool:
+        for result in pool.map(_recognize_path, paths, chunksize=4):
+            print(json.dumps(result), flush=True)
+    elapsed = time.perf_counter() - started
+    rate = len(paths) / elapsed if elapsed else 0.0
+    print(f"Processed {len(paths)} images in {elapsed:.2f}s ({rate:.2f} images/s, {workers} workers)",
+          file=sys.stderr)
+
+
+# ----- server mode -----
+
+class RecognitionStats:
+    def __init__(self):
+        self.started = time.time()
+        self.images = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds, ok):
+        with self._lock:
+            self.images += 1
+            self.errors += 0 if ok else 1
+            self.busy_seconds += seconds
+
+    def snapshot(self):
+        uptime = time.time() - self.started
+        return {
+            "images": self.images,
+            "errors": self.errors,
+            "uptime_seconds": round(uptime, 1),
+            "images_per_second": round(self.images / uptime, 3) if uptime else 0.0,
+            "mean_latency_ms": round(1000 * self.busy_seconds / self.images, 1) if self.images else None
+        }
+
+
+def make_handler(pool, known_faces, stats):
+    class RecognitionHandler(BaseHTTPRequestHandler):
+        """
+        POST /recognize with raw image bytes, or JSON {"image_url": ...};
+        GET /health and GET /stats.
+        """
+
+        def _send(self, status, payload):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/health":
+                self._send(200, {"status": "ok", "known_faces": len(known_faces[0])})
+            elif self.path == "/stats":
+                self._send(200, stats.snapshot())
+            else:
+                self._send(404, {"error": "Not found"})
+
+        def do_POST(self):
+            if self.path != "/recognize":
+                self._send(404, {"error": "Not found"})
+                return
+            started = time.perf_counter()
+            try:
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if self.headers.get("Content-Type", "").startswith("application/json"):
+                    image_url = json.loads(body).get("image_url")
+                    if not image_url:
+                        self._send(400, {"error": "No image_url provided"})
+                        return
+                    image = download_image(image_url)
+                    if image is None:
+                        self._send(502, {"error": "Failed to download image"})
+                        return
+                    body = image.getvalue()
+                if not body:
+                    self._send(400, {"error": "Empty request body"})
+                    return
+                faces = pool.submit(_recognize_bytes, body).result()
+                stats.record(time.perf_counter() - started, True)
+                self._send(200, {"faces": faces})
+            except Exception as e:
+                stats.record(time.perf_counter() - started, False)
+                self._send(500, {"error": str(e)})
+
+        def address_string(self):
+            # Unix-socket peers have no (host, port) address
+            return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+    return RecognitionHandler
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def get_request(self):
+        request, _ = super().get_request()
+        return request, ("unix", 0)
+
+
+def serve(args, known_faces):
+    """Keep models and the gallery loaded; requests are recognized across a process pool."""
+    pool = start_pool(args.workers, known_faces)
+    handler = make_handler(pool, known_faces, RecognitionStats())
+    if args.socket:
+        if os.path.exists(args.socket):
+            os.remove(args.socket)
+        server = ThreadingUnixHTTPServer(args.socket, handler)
+        where = f"unix:{args.socket}"
+    else:
+        server = ThreadingHTTPServer((args.host, args.port), handler)
+        where = f"http://{args.host}:{args.port}"
+    print(f"Serving face recognition on {where} with {args.workers} workers, {len(known_faces[0])} known faces")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        pool.shutdown()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Recognize known faces in images.")
+    parser.add_argument("image", nargs="?", help="image path or URL (single-image mode)")
+    parser.add_argument("--serve", action="store_true", help="run as a long-lived HTTP worker")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--socket", help="listen on this Unix socket instead of TCP")
+    parser.add_argument("--batch", nargs="+", metavar="PATH", help="image files or directories to process")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
+    args = parse_args()
+    if not (args.image or args.serve or args.batch):
         print("Usage: python face_recognition_script.py <image_path_or_url>")
+        print("       python face_recognition_script.py --serve [--port 8080 | --socket PATH]")
+        print("       python face_recognition_script.py --batch DIR_OR_IMAGE... [--workers N]")
         sys.exit(1)
 
-    input_source = sys.argv[1]
+    if args.serve or args.batch:
+        known_faces = encode_known_faces()
+        if args.serve:
+            serve(args, known_faces)
+        else:
+            run_batch(args.batch, args.workers, known_faces)
+        sys.exit(0)
+
+    input_source = args.image
 
     if is_url(input_source):
         print("Downloading image from URL...")
@@ -86,5 +306,4 @@ if __name__ == "__main__":
 
     if image_path:
         known_faces = encode_known_faces()
-        result = recognize_faces(image_path, known_faces)
-        print(result)
+        print_results(recognize_faces(image_path, known_faces))
@@ -0,0 +1,84 @@
+"""
+Face Index Benchmark for Trinetra
+Recall and latency of the IVF face index against the exact scan on a
+synthetic watchlist of 128-d encodings
+
+    python benchmarks/face_index_benchmark.py --faces 200000 --probes 200
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from face_index import IVFIndex  # noqa: E402
+
+
+def synthetic_gallery(rng, faces: int, dim: int = 128, images_per_identity: int = 2):
+    """Identities spread like dlib encodings (typical inter-person distance ~0.9), a few images each"""
+    identities = rng.normal(scale=0.065, size=(faces // images_per_identity + 1, dim))
+    owners = np.arange(faces) // images_per_identity
+    vectors = identities[owners] + rng.normal(scale=0.02, size=(faces, dim))
+    return vectors.astype(np.float32)
+
+
+def timed(search, probes: np.ndarray):
+    results, latencies = [], []
+    for probe in probes:
+        started = time.perf_counter()
+        results.append(search(probe))
+        latencies.append((time.perf_counter() - started) * 1000)
+    return results, np.array(latencies)
+
+
+def exact_search(vectors: np.ndarray, keys: np.ndarray, k: int):
+    """The full scan FaceGallery runs on its N x 128 matrix for small galleries"""
+    norms = (vectors ** 2).sum(axis=1)
+
+    def search(probe):
+        squared = norms - 2.0 * vectors @ probe
+        top = np.argpartition(squared, k - 1)[:k]
+        return keys[top[np.argsort(squared[top])]].tolist()
+    return search
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--faces", type=int, default=100000)
+    parser.add_argument("--probes", type=int, default=200)
+    # Each synthetic identity has two images, so recall@2 asks for both
+    parser.add_argument("--k", type=int, default=2)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 8, 16, 32])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = synthetic_gallery(rng, args.faces)
+    keys = [f"face-{i}" for i in range(args.faces)]
+    probes = vectors[rng.integers(0, args.faces, args.probes)] + rng.normal(
+        scale=0.02, size=(args.probes, vectors.shape[1])).astype(np.float32)
+
+    index = IVFIndex(exact_max=0)
+    started = time.perf_counter()
+    index.add(keys, vectors)
+    print(f"Indexed {args.faces} encodings in {time.perf_counter() - started:.1f}s")
+
+    truth, latencies = timed(exact_search(vectors, np.array(keys), args.k), probes)
+    print(f"{'mode':<14}{'recall@1':>10}{'recall@' + str(args.k):>11}{'p50 ms':>10}{'p95 ms':>10}")
+    print(f"{'exact':<14}{1.0:>10.4f}{1.0:>11.4f}{np.percentile(latencies, 50):>10.2f}"
+          f"{np.percentile(latencies, 95):>10.2f}")
+
+    for nprobe in args.nprobe:
+        index.nprobe = nprobe
+        found, latencies = timed(lambda probe: index.search(probe, k=args.k, exact=False)[0][0], probes)
+        top1 = np.mean([a[:1] == b[:1] for a, b in zip(found, truth)])
+        topk = np.mean([len(set(a) & set(b)) / len(b) for a, b in zip(found, truth)])
+        print(f"{'ivf nprobe ' + str(nprobe):<14}{top1:>10.4f}{topk:>11.4f}{np.percentile(latencies, 50):>10.2f}"
+              f"{np.percentile(latencies, 95):>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Face Pipeline Benchmark for Trinetra
+Frames per second and faces found by full-resolution detection versus the
+downscaled two-stage pipeline, on sample frames scaled up to CCTV sizes
+
+    python benchmarks/face_pipeline_benchmark.py --frames known_faces --width 3840
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import face_recognition  # noqa: E402
+
+from face_pipeline import detect_and_encode, detection_config  # noqa: E402
+
+
+def load_frames(directory: str, width: int):
+    """Every image in directory as RGB, resized to `width` pixels wide (aspect kept)"""
+    frames = []
+    for filename in sorted(os.listdir(directory)):
+        if not filename.lower().endswith(('.jpg', '.jpeg', '.png')):
+            continue
+        image = Image.open(os.path.join(directory, filename)).convert("RGB")
+        if width:
+            image = image.resize((width, round(image.height * width / image.width)), Image.BILINEAR)
+        frames.append(np.array(image))
+    return frames
+
+
+def full_resolution(frame):
+    locations = face_recognition.face_locations(frame)
+    return locations, face_recognition.face_encodings(frame, locations)
+
+
+def measure(name: str, run, frames, repeat: int):
+    faces = 0
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for frame in frames:
+            faces += len(run(frame)[0])
+    elapsed = time.perf_counter() - started
+    count = repeat * len(frames)
+    print(f"{name:<28}{count / elapsed:>12.2f}{1000 * elapsed / count:>12.1f}{faces / repeat:>10.1f}")
+    return count / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--frames", default="known_faces", help="directory of sample frames")
+    parser.add_argument("--width", type=int, default=3840, help="resize frames to this width, 0 keeps them")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--max-sides", type=int, nargs="+", default=[1920, 1280, 960, 640])
+    args = parser.parse_args()
+
+    frames = load_frames(args.frames, args.width)
+    if not frames:
+        sys.exit(f"No images found in {args.frames}")
+    print(f"{len(frames)} frames of {frames[0].shape[1]}x{frames[0].shape[0]}, {args.repeat} passes")
+    print(f"{'pipeline':<28}{'frames/s':>12}{'ms/frame':>12}{'faces':>10}")
+
+    baseline = measure("full resolution", full_resolution, frames, args.repeat)
+    for max_side in args.max_sides:
+        config = detection_config({"max_side": max_side})
+        rate = measure(f"two-stage max_side={max_side}", lambda frame: detect_and_encode(frame, config),
+                       frames, args.repeat)
+        print(f"{'':<28}{rate / baseline:>11.1f}x")
+
+
+if __name__ == "__main__":
+    main()
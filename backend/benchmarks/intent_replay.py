@@ -0,0 +1,75 @@
+"""
+Intent Replay for Trinetra
+Agreement between the local intent classifier and Gemini on a replay set of
+prompts Gemini already labelled (the query_determine replay log), and how
+many of them the fast path would have answered. The log holds every prompt
+that fell back to Gemini plus an INTENT_SHADOW_RATE sample of fast-path
+answers checked in the background; the "shadow" rows are the fast path's
+own traffic.
+
+    python benchmarks/intent_replay.py --replay data/cache/intent_replay.jsonl --show 10
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from intent_classifier import CONFIDENCE_THRESHOLD, IntentClassifier, load_locations, read_replay  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--replay", default=os.path.join("data", "cache", "intent_replay.jsonl"))
+    parser.add_argument("--locations", default=os.getenv("INTENT_LOCATIONS_FILE"), help="location table JSON")
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.6, 0.7, CONFIDENCE_THRESHOLD, 0.9])
+    parser.add_argument("--show", type=int, default=0, help="print this many fast-path disagreements")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.replay):
+        sys.exit(f"No replay log at {args.replay}")
+    records = read_replay(args.replay)
+    if not records:
+        sys.exit(f"No labelled prompts in {args.replay}")
+
+    classifier = IntentClassifier(load_locations(args.locations))
+    started = time.perf_counter()
+    intents = [classifier.rules(record["prompt"]) for record in records]
+    elapsed = time.perf_counter() - started
+    print(f"{len(records)} prompts, {1e6 * elapsed / len(records):.1f} µs per rule classification")
+
+    location_agree = [intent["location"] == record["location"] for intent, record in zip(intents, records)]
+    face_agree = [intent["face_search"] == record["face_search"] for intent, record in zip(intents, records)]
+    for source in sorted({record["source"] for record in records}):
+        rows = [i for i, record in enumerate(records) if record["source"] == source]
+        agree = sum(location_agree[i] and face_agree[i] for i in rows) / len(rows)
+        fast = sum(intents[i]["confidence"] >= CONFIDENCE_THRESHOLD for i in rows) / len(rows)
+        print(f"{source}: {len(rows)} prompts, {fast:.3f} on the fast path, {agree:.3f} agreement with Gemini")
+    print(f"all prompts: location {sum(location_agree) / len(records):.3f}, "
+          f"face_search {sum(face_agree) / len(records):.3f} agreement with Gemini")
+
+    print(f"{'threshold':>10}{'fast path':>11}{'agreement':>11}{'location':>10}{'face':>8}")
+    for threshold in args.thresholds:
+        fast = [i for i, intent in enumerate(intents) if intent["confidence"] >= threshold]
+        if not fast:
+            print(f"{threshold:>10.2f}{0.0:>11.3f}{'-':>11}{'-':>10}{'-':>8}")
+            continue
+        both = sum(location_agree[i] and face_agree[i] for i in fast) / len(fast)
+        location = sum(location_agree[i] for i in fast) / len(fast)
+        face = sum(face_agree[i] for i in fast) / len(fast)
+        print(f"{threshold:>10.2f}{len(fast) / len(records):>11.3f}{both:>11.3f}{location:>10.3f}{face:>8.3f}")
+
+    shown = 0
+    for intent, record, location_ok, face_ok in zip(intents, records, location_agree, face_agree):
+        if shown >= args.show:
+            break
+        if intent["confidence"] >= CONFIDENCE_THRESHOLD and not (location_ok and face_ok):
+            shown += 1
+            print(f"- {record['prompt']!r}: rules ({intent['location']}, {intent['face_search']}) "
+                  f"vs Gemini ({record['location']}, {record['face_search']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Quantized Camera Search Benchmark for Trinetra
+Recall@k, latency, disk size and resident memory of the int8 camera store
+against the exact float32 scan, for several re-rank shortlist sizes.
+
+Each mode runs in a fresh process with the store's files evicted from the
+page cache first: "cold ms" is the first query (everything read from disk),
+p50/p95 the queries after it, and "resident MB" how much the process's RSS
+grew while querying, i.e. the hot set that mode needs to stay fast.
+
+    python benchmarks/quantization_benchmark.py --cameras 200000 --queries 200
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import camera_store  # noqa: E402
+from camera_store import CameraStore  # noqa: E402
+
+
+def clustered_vectors(rng, count: int, dim: int, clusters: int = 256) -> np.ndarray:
+    """Unit vectors around a few hundred topics, closer to real descriptions than pure noise"""
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, count)] + 0.6 * rng.normal(size=(count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def build_store(path: str, vectors: np.ndarray, quantization=None) -> CameraStore:
+    store = CameraStore(path, dim=vectors.shape[1], quantization=quantization)
+    for start in range(0, len(vectors), 10000):
+        chunk = vectors[start:start + 10000]
+        ids = [f"cam-{start + i}" for i in range(len(chunk))]
+        store.add(ids=ids, documents=[""] * len(ids), metadatas=[{}] * len(ids), embeddings=chunk)
+    return store
+
+
+def embedding_files(store: CameraStore):
+    """The float32 matrix, live bitmap and any int8 codes and scales"""
+    paths = [store._vectors_path, store._live_path, store._codes_path, store._scales_path]
+    return [path for path in paths if os.path.exists(path)]
+
+
+def evict(paths):
+    """Flush and drop the files from the page cache, so the next reads come from disk"""
+    if not hasattr(os, "posix_fadvise"):
+        return
+    for path in paths:
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+
+
+def resident_bytes():
+    """Current RSS from /proc (Linux), else None"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def run_queries(store: CameraStore, queries: np.ndarray, k: int):
+    results, latencies = [], []
+    for query in queries:
+        started = time.perf_counter()
+        results.append(store.query([query], n_results=k)["ids"][0])
+        latencies.append((time.perf_counter() - started) * 1000)
+    return results, np.array(latencies)
+
+
+def measure(args):
+    """One mode in this (fresh) process; prints a JSON line for the parent"""
+    queries = np.load(args.queries_file)
+    store = CameraStore(args.measure, dim=queries.shape[1], quantization=args.quantization)
+    camera_store.RERANK_FACTOR = args.rerank_factor
+    evict(embedding_files(store))
+    before = resident_bytes()
+    found, latencies = run_queries(store, queries, args.k)
+    after = resident_bytes()
+    print(json.dumps({
+        "ids": found,
+        "cold_ms": float(latencies[0]),
+        "p50_ms": float(np.percentile(latencies[1:], 50)),
+        "p95_ms": float(np.percentile(latencies[1:], 95)),
+        "resident": after - before if before is not None else None
+    }))
+
+
+def run_mode(args, path, queries_file, quantization=None, factor=camera_store.RERANK_FACTOR):
+    command = [sys.executable, os.path.abspath(__file__), "--measure", path, "--queries-file", queries_file,
+               "--k", str(args.k), "--rerank-factor", str(factor)]
+    if quantization:
+        command += ["--quantization", quantization]
+    output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--cameras", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--rerank-factors", type=int, nargs="+", default=[2, 4, 8, 16])
+    # internal: measure one store in a child process
+    parser.add_argument("--measure", help=argparse.SUPPRESS)
+    parser.add_argument("--queries-file", help=argparse.SUPPRESS)
+    parser.add_argument("--quantization", help=argparse.SUPPRESS)
+    parser.add_argument("--rerank-factor", type=int, default=camera_store.RERANK_FACTOR, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.measure:
+        return measure(args)
+
+    rng = np.random.default_rng(0)
+    vectors = clustered_vectors(rng, args.cameras, args.dim)
+    queries = vectors[rng.integers(0, args.cameras, args.queries)] + 0.3 * rng.normal(
+        size=(args.queries, args.dim)).astype(np.float32)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        print(f"Building stores with {args.cameras} x {args.dim} embeddings ...")
+        exact_path, int8_path = os.path.join(workdir, "exact"), os.path.join(workdir, "int8")
+        exact_disk = sum(os.path.getsize(path) for path in embedding_files(build_store(exact_path, vectors)))
+        int8_disk = sum(os.path.getsize(path)
+                        for path in embedding_files(build_store(int8_path, vectors, quantization="int8")))
+        queries_file = os.path.join(workdir, "queries.npy")
+        np.save(queries_file, queries)
+        print(f"On disk: float32 {exact_disk / 2**20:.1f} MB, int8 store {int8_disk / 2**20:.1f} MB "
+              f"({int8_disk / exact_disk:.2f}x: the float32 matrix is kept, cold, for re-ranking)")
+
+        def row(label, result, recall):
+            resident = "-" if result["resident"] is None else f"{result['resident'] / 2**20:.1f}"
+            print(f"{label:<22}{recall:>10.4f}{result['cold_ms']:>10.1f}{result['p50_ms']:>10.2f}"
+                  f"{result['p95_ms']:>10.2f}{resident:>13}")
+
+        exact = run_mode(args, exact_path, queries_file)
+        print(f"{'mode':<22}{'recall@' + str(args.k):>10}{'cold ms':>10}{'p50 ms':>10}{'p95 ms':>10}"
+              f"{'resident MB':>13}")
+        row("float32 exact", exact, 1.0)
+        for factor in args.rerank_factors:
+            result = run_mode(args, int8_path, queries_file, "int8", factor)
+            recall = np.mean([len(set(a) & set(b)) / len(b) for a, b in zip(result["ids"], exact["ids"])])
+            row(f"int8 rerank x{factor}", result, recall)
+
+
+if __name__ == "__main__":
+    main()
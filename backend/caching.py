@@ -0,0 +1,252 @@
+"""
+Caching Utilities for Trinetra
+In-process LRU caches with an optional SQLite layer that survives restarts
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+# Disk tiers prune expired rows and trim to max_entries once every this many writes
+DISK_PRUNE_EVERY = 256
+
+
+def cache_key(*parts) -> str:
+    """Content-addressed key: sha256 over the parts, NUL-separated"""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class LRUCache:
+    """Thread-safe, size-bounded LRU with an optional per-entry TTL (seconds)"""
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at < time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None, expires_at: Optional[float] = None):
+        """expires_at (epoch seconds) takes precedence over ttl, for entries that already have a deadline"""
+        if expires_at is None:
+            ttl = self.ttl if ttl is None else ttl
+            expires_at = time.time() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class DiskCache:
+    """
+    Key -> bytes store in SQLite, with optional expiry. Expired rows, then
+    the least recently written ones beyond max_entries (None for no bound),
+    are pruned on open and every DISK_PRUNE_EVERY writes.
+    """
+
+    def __init__(self, path: str, max_entries: Optional[int] = None):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB, expires_at REAL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS cache_expires_at ON cache (expires_at)")
+        with self._lock:
+            self._prune()
+
+    def get(self, key: str) -> Optional[bytes]:
+        entry = self.get_entry(key)
+        return entry[0] if entry is not None else None
+
+    def get_entry(self, key: str) -> Optional[Tuple[bytes, Optional[float]]]:
+        """(value, expires_at) of an unexpired row, or None"""
+        with self._lock:
+            row = self._db.execute("SELECT value, expires_at FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            value, expires_at = row
+            if expires_at is not None and expires_at < time.time():
+                with self._db:
+                    self._db.execute("DELETE FROM cache WHERE key = ?", (key,))
+                return None
+            return value, expires_at
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None):
+        expires_at = time.time() + ttl if ttl else None
+        with self._lock:
+            with self._db:
+                # REPLACE gives the row a new rowid, so rowid order is write order
+                self._db.execute(
+                    "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, value, expires_at)
+                )
+            self._writes += 1
+            if self._writes % DISK_PRUNE_EVERY == 0:
+                self._prune()
+
+    def _prune(self):
+        """Drop expired rows, then the oldest writes beyond max_entries; caller holds the lock"""
+        with self._db:
+            self._db.execute("DELETE FROM cache WHERE expires_at < ?", (time.time(),))
+            if self.max_entries is not None:
+                excess = self._db.execute("SELECT COUNT(*) FROM cache").fetchone()[0] - self.max_entries
+                if excess > 0:
+                    self._db.execute(
+                        "DELETE FROM cache WHERE rowid IN (SELECT rowid FROM cache ORDER BY rowid LIMIT ?)",
+                        (excess,)
+                    )
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    def clear(self):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM cache")
+
+
+class TieredCache:
+    """
+    LRU in front of an optional DiskCache.
+
+    encode/decode convert values to and from bytes for the disk layer; disk
+    hits are promoted into the LRU with whatever time the disk row had left.
+    """
+
+    def __init__(self, name: str, maxsize: int = 1024, ttl: Optional[float] = None,
+                 disk_path: Optional[str] = None, disk_max_entries: Optional[int] = None,
+                 encode: Callable[[Any], bytes] = None, decode: Callable[[bytes], Any] = None):
+        self.name = name
+        self.ttl = ttl
+        self.memory = LRUCache(maxsize, ttl)
+        self.disk = DiskCache(disk_path, disk_max_entries) if disk_path else None
+        self._encode = encode or (lambda value: value)
+        self._decode = decode or (lambda value: value)
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        value = self.memory.get(key)
+        if value is not None:
+            self.memory_hits += 1
+            return value
+
+        if self.disk is not None:
+            try:
+                entry = self.disk.get_entry(key)
+            except sqlite3.Error as e:
+                print(f"⚠️ {self.name} disk cache read failed: {e}")
+                entry = None
+            if entry is not None:
+                raw, expires_at = entry
+                value = self._decode(raw)
+                self.memory.set(key, value, expires_at=expires_at)
+                self.disk_hits += 1
+                return value
+
+        self.misses += 1
+        return None
+
+    def set(self, key: str, value: Any):
+        self.memory.set(key, value)
+        if self.disk is not None:
+            try:
+                self.disk.set(key, self._encode(value), self.ttl)
+            except sqlite3.Error as e:
+                print(f"⚠️ {self.name} disk cache write failed: {e}")
+
+    def clear(self):
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def stats(self) -> Dict:
+        hits = self.memory_hits + self.disk_hits
+        lookups = hits + self.misses
+        return {
+            "hits": hits,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_ratio": hits / lookups if lookups else 0.0,
+            "memory_entries": len(self.memory),
+            "disk_entries": len(self.disk) if self.disk is not None else None
+        }
+
+
+class EmbeddingCache(TieredCache):
+    """Embeddings keyed by model, task type and text; stored on disk as raw float32"""
+
+    def __init__(self, maxsize: int = 10000, disk_path: Optional[str] = None,
+                 disk_max_entries: Optional[int] = 200000):
+        super().__init__(
+            "embeddings",
+            maxsize=maxsize,
+            disk_path=disk_path,
+            disk_max_entries=disk_max_entries,
+            encode=lambda vector: np.asarray(vector, dtype=np.float32).tobytes(),
+            decode=lambda raw: np.frombuffer(raw, dtype=np.float32).tolist()
+        )
+
+    @staticmethod
+    def key(model: str, task_type: str, text: str) -> str:
+        return cache_key(model, task_type, text)
+
+
+class LLMResponseCache(TieredCache):
+    """
+    Parsed JSON answers keyed by model and normalized prompt (case and
+    whitespace folded), expiring after `ttl` seconds; stored on disk as JSON
+    """
+
+    def __init__(self, maxsize: int = 2048, ttl: Optional[float] = 3600, disk_path: Optional[str] = None,
+                 disk_max_entries: Optional[int] = 50000):
+        super().__init__(
+            "llm_responses",
+            maxsize=maxsize,
+            ttl=ttl,
+            disk_path=disk_path,
+            disk_max_entries=disk_max_entries,
+            encode=lambda value: json.dumps(value).encode("utf-8"),
+            decode=lambda raw: json.loads(raw)
+        )
+
+    @staticmethod
+    def key(model: str, prompt: str) -> str:
+        return cache_key(model, re.sub(r"\s+", " ", prompt).strip().casefold())
@@ -0,0 +1,764 @@
+"""
+Persistent Camera Store for Trinetra
+Camera ids, documents and metadata live in SQLite; embeddings live in a
+memory-mapped float32 matrix that is mapped lazily on first use
+"""
+
+import json
+import mmap
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from geo_index import GeoGridIndex, parse_location
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cameras (
+    id TEXT PRIMARY KEY,
+    row INTEGER NOT NULL UNIQUE,
+    document TEXT,
+    metadata TEXT,
+    location TEXT,
+    ipId TEXT,
+    tokenId TEXT,
+    CID TEXT
+);
+CREATE TABLE IF NOT EXISTS store_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+INITIAL_CAPACITY = 1024
+
+# Background compaction starts once tombstoned rows exceed both limits and
+# moves this many rows per locked step, so searches interleave with it
+COMPACT_MIN_TOMBSTONES = 1024
+COMPACT_TOMBSTONE_RATIO = 0.25
+COMPACT_BATCH_ROWS = 10000
+
+# Optional int8 scan: each row is also stored as int8 codes times a per-row
+# scale, and the shortlist of max(k * RERANK_FACTOR, RERANK_MIN) rows is
+# re-scored from the float32 matrix. This trades disk for a smaller hot set:
+# the codes are kept next to the float32 file (about 1.25x the storage), but
+# only they are scanned; the float32 mapping is advised MADV_RANDOM, so a
+# query pages in just the shortlist's rows and the matrix can stay cold.
+# numpy has no int8 matmul, so with everything already in RAM the scan is
+# slower than the exact one; it wins when the float32 matrix does not fit.
+RERANK_FACTOR = 8
+RERANK_MIN = 64
+QUANT_SCAN_ROWS = 1024  # 3 MB float32 scratch at 768-d, reused for every chunk
+
+# Full-text index over each camera's description (user text plus the Gemini
+# frame description), kept in step with the cameras table by triggers
+TEXT_INDEX_SCHEMA = (
+    "CREATE VIRTUAL TABLE cameras_fts USING fts5(text, tokenize = 'porter unicode61')",
+    """CREATE TRIGGER cameras_fts_insert AFTER INSERT ON cameras BEGIN
+        INSERT INTO cameras_fts (rowid, text)
+        VALUES (new.rowid, coalesce(json_extract(new.metadata, '$.description'), new.document));
+    END""",
+    """CREATE TRIGGER cameras_fts_update AFTER UPDATE OF document, metadata ON cameras BEGIN
+        UPDATE cameras_fts SET text = coalesce(json_extract(new.metadata, '$.description'), new.document)
+        WHERE rowid = new.rowid;
+    END""",
+    """CREATE TRIGGER cameras_fts_delete AFTER DELETE ON cameras BEGIN
+        DELETE FROM cameras_fts WHERE rowid = old.rowid;
+    END""",
+    "INSERT INTO cameras_fts (rowid, text) "
+    "SELECT rowid, coalesce(json_extract(metadata, '$.description'), document) FROM cameras",
+)
+
+# Reciprocal rank fusion constant: a hit at rank r contributes 1 / (RRF_K + r)
+RRF_K = 60
+
+# Metadata fields with a secondary (value -> rows) index, usable in `where` filters
+INDEXED_FIELDS = ("location", "ipId", "tokenId", "CID")
+
+
+def _index_value(value) -> Optional[str]:
+    if value is None:
+        return None
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, sort_keys=True)
+    return str(value)
+
+
+def _where_sql(where: Dict):
+    """
+    Translate a chroma-style filter into SQL over the indexed columns.
+    Each field maps to a value, {"$eq": value} or {"$in": [values]}; fields are ANDed.
+    """
+    clauses, params = [], []
+    for field, condition in where.items():
+        if field not in INDEXED_FIELDS:
+            raise ValueError(f"Cannot filter on '{field}'; indexed fields are {', '.join(INDEXED_FIELDS)}")
+        if isinstance(condition, dict):
+            if set(condition) == {"$eq"}:
+                values = [condition["$eq"]]
+            elif set(condition) == {"$in"} and isinstance(condition["$in"], list):
+                values = condition["$in"]
+            else:
+                raise ValueError(f"Unsupported filter on '{field}': use a value, $eq or $in")
+        else:
+            values = [condition]
+        if not values:
+            clauses.append("0")
+            continue
+        clauses.append(f'"{field}" IN ({",".join("?" * len(values))})')
+        params.extend(_index_value(value) for value in values)
+    return " AND ".join(clauses) or "1", params
+
+
+def quantize_int8(vectors: np.ndarray):
+    """Symmetric per-row int8 codes and scales; vectors ~= codes * scales[:, None]"""
+    peaks = np.abs(vectors).max(axis=1)
+    peaks[peaks == 0] = 1.0
+    scales = (peaks / 127.0).astype(np.float32)
+    codes = np.round(vectors / scales[:, None]).astype(np.int8)
+    return codes, scales
+
+
+def _advise_random(array: np.memmap):
+    """No read-ahead on a mapping that is only read a few scattered rows at a time"""
+    mapping = getattr(array, "_mmap", None)
+    if mapping is not None and hasattr(mmap, "MADV_RANDOM"):
+        mapping.madvise(mmap.MADV_RANDOM)
+
+
+def _match_expression(text: str) -> Optional[str]:
+    """FTS5 query matching any term of free text; terms are quoted so operators stay literal"""
+    terms = dict.fromkeys(term.lower() for term in re.findall(r"\w+", text))
+    return " OR ".join(f'"{term}"' for term in terms) or None
+
+
+class CameraStore:
+    """
+    Durable camera collection with the same add/get/query/delete interface
+    the endpoints used with chromadb.
+
+    Row i of the embedding file holds the unit-normalized embedding of the
+    camera whose `row` column is i. Deleting a camera only clears its bit in
+    the live bitmap (a tombstone); a background compaction later moves the
+    last live rows into the holes, a batch at a time.
+    """
+
+    def __init__(self, path: str, dim: int = 768, quantization: Optional[str] = None):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(os.path.join(path, "cameras.sqlite3"), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        self._ensure_indexes()
+        self._ensure_text_index()
+
+        stored_dim = self.get_meta("dim")
+        self.dim = int(stored_dim) if stored_dim else dim
+        if not stored_dim:
+            self.set_meta("dim", str(self.dim))
+
+        self._count = self._db.execute("SELECT COUNT(*) FROM cameras").fetchone()[0]
+        self._version = int(self.get_meta("version") or 0)
+        # Rows in use, live or tombstoned; stores written before tombstones were dense
+        self._high = int(self.get_meta("rows") or self._count)
+        self._layout = 0  # bumped whenever compaction moves rows
+        self._compacting = False
+        if quantization not in (None, "int8"):
+            raise ValueError(f"Unsupported quantization '{quantization}'; use None or 'int8'")
+        self.quantization = quantization
+        self._vectors_path = os.path.join(path, "embeddings.f32")
+        self._codes_path = os.path.join(path, "embeddings.i8")
+        self._scales_path = os.path.join(path, "scales.f32")
+        if not quantization:
+            # Codes are not maintained while quantization is off, so drop stale ones
+            for stale in (self._codes_path, self._scales_path):
+                if os.path.exists(stale):
+                    os.remove(stale)
+        self._live_path = os.path.join(path, "live.u8")
+        self._matrix = None  # np.memmap, mapped on first access
+        self._live = None  # np.memmap of 0/1 per row, mapped with the matrix
+        self._codes = None  # int8 codes and per-row scales, when quantization is on
+        self._scales = None
+        self._geo = None  # GeoGridIndex, built from the location column on first use
+
+    # ----- store metadata -----
+
+    def get_meta(self, key: str) -> Optional[str]:
+        row = self._db.execute("SELECT value FROM store_meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: str):
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT INTO store_meta (key, value) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (key, value)
+            )
+
+    def count(self) -> int:
+        return self._count
+
+    def tombstones(self) -> int:
+        return self._high - self._count
+
+    def version(self) -> int:
+        """Monotonic counter bumped by every add and delete"""
+        return self._version
+
+    def _set_high(self, high: int):
+        # Called inside a transaction, like _bump_version
+        self._high = high
+        self._db.execute(
+            "INSERT INTO store_meta (key, value) VALUES ('rows', ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (str(high),)
+        )
+
+    def _bump_version(self):
+        # Called inside the mutation's transaction so the counter persists with it
+        self._version += 1
+        self._db.execute(
+            "INSERT INTO store_meta (key, value) VALUES ('version', ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (str(self._version),)
+        )
+
+    def _ensure_indexes(self):
+        """Create the metadata indexes, backfilling columns for stores created before them"""
+        columns = {column[1] for column in self._db.execute("PRAGMA table_info(cameras)")}
+        with self._db:
+            for field in INDEXED_FIELDS:
+                if field not in columns:
+                    self._db.execute(f'ALTER TABLE cameras ADD COLUMN "{field}" TEXT')
+                    self._db.execute(
+                        f'UPDATE cameras SET "{field}" = CAST(json_extract(metadata, \'$.{field}\') AS TEXT)'
+                    )
+                self._db.execute(f'CREATE INDEX IF NOT EXISTS idx_cameras_{field} ON cameras ("{field}")')
+
+    def _ensure_text_index(self):
+        """Create the full-text index, filling it from existing cameras on first run"""
+        exists = self._db.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'cameras_fts'"
+        ).fetchone()
+        if not exists:
+            with self._db:
+                for statement in TEXT_INDEX_SCHEMA:
+                    self._db.execute(statement)
+
+    # ----- embedding matrix -----
+
+    def _map(self, min_rows: int = 0) -> np.memmap:
+        """Map the embedding file and live bitmap, growing both (doubling) to hold min_rows rows"""
+        row_bytes = self.dim * 4
+        size = os.path.getsize(self._vectors_path) if os.path.exists(self._vectors_path) else 0
+        capacity = size // row_bytes
+
+        if self._matrix is not None and capacity >= min_rows:
+            return self._matrix
+
+        if capacity < min_rows or capacity == 0:
+            capacity = max(capacity, INITIAL_CAPACITY)
+            while capacity < min_rows:
+                capacity *= 2
+            if self._matrix is not None:
+                self._matrix.flush()
+                self._live.flush()
+                if self._codes is not None:
+                    self._codes.flush()
+                    self._scales.flush()
+            with open(self._vectors_path, "ab") as f:
+                f.truncate(capacity * row_bytes)
+
+        new_bitmap = not os.path.exists(self._live_path)
+        with open(self._live_path, "ab") as f:
+            if f.tell() < capacity:
+                f.truncate(capacity)
+        self._matrix = np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+        if self.quantization:
+            _advise_random(self._matrix)
+        self._live = np.memmap(self._live_path, dtype=np.uint8, mode="r+", shape=(capacity,))
+        if new_bitmap and self._high:
+            self._live[:self._high] = 1  # store predates tombstones: every row is live
+            self._live.flush()
+        if self.quantization:
+            self._map_codes(capacity)
+        return self._matrix
+
+    def _map_codes(self, capacity: int):
+        new_codes = not os.path.exists(self._codes_path)
+        for path, row_bytes in ((self._codes_path, self.dim), (self._scales_path, 4)):
+            with open(path, "ab") as f:
+                if f.tell() < capacity * row_bytes:
+                    f.truncate(capacity * row_bytes)
+        self._codes = np.memmap(self._codes_path, dtype=np.int8, mode="r+", shape=(capacity, self.dim))
+        self._scales = np.memmap(self._scales_path, dtype=np.float32, mode="r+", shape=(capacity,))
+        if new_codes and self._high:
+            print(f"🔧 Quantizing {self._high} camera embeddings to int8")
+            for start in range(0, self._high, QUANT_SCAN_ROWS):
+                stop = min(start + QUANT_SCAN_ROWS, self._high)
+                self._codes[start:stop], self._scales[start:stop] = quantize_int8(self._matrix[start:stop])
+            self._codes.flush()
+            self._scales.flush()
+
+    def _normalize(self, vectors) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2 or vectors.shape[1] != self.dim:
+            raise ValueError(f"Expected embeddings of dimension {self.dim}, got shape {vectors.shape}")
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0  # zero vectors stay zero and score 0 against everything
+        return vectors / norms
+
+    # ----- collection API -----
+
+    def add(self, ids: List[str], documents: List[str], metadatas: List[Dict], embeddings: List[List[float]]):
+        """Insert or overwrite cameras; all lists are aligned with ids"""
+        if not ids:
+            return
+        vectors = self._normalize(embeddings)
+        if len(vectors) != len(ids):
+            raise ValueError("ids and embeddings must have the same length")
+
+        with self._lock:
+            existing = self._rows_for_ids(ids)
+            rows = []
+            new_high = self._high
+            for cam_id in ids:
+                row = existing.get(cam_id)
+                if row is None:
+                    row = new_high
+                    existing[cam_id] = row
+                    new_high += 1
+                rows.append(row)
+
+            matrix = self._map(new_high)
+            matrix[rows] = vectors
+            matrix.flush()
+            if self._codes is not None:
+                self._codes[rows], self._scales[rows] = quantize_int8(vectors)
+                self._codes.flush()
+                self._scales.flush()
+            self._live[rows] = 1
+            self._live.flush()
+
+            metadatas = [metadatas[i] if i < len(metadatas) else {} for i in range(len(ids))]
+            with self._db:
+                self._db.executemany(
+                    "INSERT INTO cameras (id, row, document, metadata, location, ipId, tokenId, CID) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT(id) DO UPDATE SET document = excluded.document, metadata = excluded.metadata, "
+                    "location = excluded.location, ipId = excluded.ipId, "
+                    "tokenId = excluded.tokenId, CID = excluded.CID",
+                    [
+                        (
+                            cam_id,
+                            row,
+                            documents[i] if i < len(documents) else "",
+                            json.dumps(metadatas[i]),
+                            *(_index_value(metadatas[i].get(field)) for field in INDEXED_FIELDS)
+                        )
+                        for i, (cam_id, row) in enumerate(zip(ids, rows))
+                    ]
+                )
+                added = new_high - self._high
+                self._set_high(new_high)
+                self._bump_version()
+            self._count += added
+
+            if self._geo is not None:
+                for cam_id, metadata in zip(ids, metadatas):
+                    point = parse_location(metadata.get("location"))
+                    if point:
+                        self._geo.add(cam_id, *point)
+                    else:
+                        self._geo.remove(cam_id)
+
+    def update_metadata(self, cam_id: str, changes: Dict) -> Optional[Dict]:
+        """Merge changes into one camera's metadata, keeping its embedding; None if unknown"""
+        with self._lock:
+            found = self._db.execute("SELECT metadata FROM cameras WHERE id = ?", (cam_id,)).fetchone()
+            if found is None:
+                return None
+            metadata = {**json.loads(found[0]), **changes}
+            with self._db:
+                self._db.execute(
+                    "UPDATE cameras SET metadata = ?, location = ?, ipId = ?, tokenId = ?, CID = ? WHERE id = ?",
+                    (json.dumps(metadata), *(_index_value(metadata.get(field)) for field in INDEXED_FIELDS), cam_id)
+                )
+                self._bump_version()
+
+            if self._geo is not None and "location" in changes:
+                point = parse_location(metadata.get("location"))
+                if point:
+                    self._geo.add(cam_id, *point)
+                else:
+                    self._geo.remove(cam_id)
+            return metadata
+
+    def get(self, ids: Optional[List[str]] = None, include=None, where: Optional[Dict] = None) -> Dict:
+        with self._lock:
+            if ids:
+                placeholders = ",".join("?" * len(ids))
+                found = {
+                    cam_id: (document, metadata)
+                    for cam_id, document, metadata in self._db.execute(
+                        f"SELECT id, document, metadata FROM cameras WHERE id IN ({placeholders})", list(ids)
+                    )
+                }
+                ordered = [(cam_id, *found[cam_id]) for cam_id in ids if cam_id in found]
+            else:
+                clauses, params = _where_sql(where or {})
+                ordered = self._db.execute(
+                    f"SELECT id, document, metadata FROM cameras WHERE {clauses} ORDER BY rowid", params
+                ).fetchall()
+
+        return {
+            "ids": [cam_id for cam_id, _, _ in ordered],
+            "metadatas": [json.loads(metadata) for _, _, metadata in ordered],
+            "documents": [document for _, document, _ in ordered]
+        }
+
+    def page(self, after: Optional[int] = None, limit: Optional[int] = None) -> Dict:
+        """
+        Cameras in registration order, starting after cursor `after`.
+        next_cursor is None on the last page; limit=None returns everything.
+        """
+        sql = "SELECT rowid, id, document, metadata FROM cameras WHERE rowid > ? ORDER BY rowid"
+        params = [after or 0]
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit + 1)
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = rows[-1][0]
+        return {
+            "ids": [cam_id for _, cam_id, _, _ in rows],
+            "metadatas": [json.loads(metadata) for _, _, _, metadata in rows],
+            "documents": [document for _, _, document, _ in rows],
+            "next_cursor": next_cursor
+        }
+
+    def query(self, query_embeddings, n_results: int = 1, where: Optional[Dict] = None) -> Dict:
+        """
+        Cosine top-k over live cameras; distances are 1 - cosine similarity.
+
+        With `where`, the metadata indexes select the candidate rows first and
+        only those rows of the embedding matrix are scored. Scoring runs
+        outside the store lock; if a compaction step moved rows meanwhile,
+        the query is scored again against the new layout.
+        """
+        queries = self._normalize(np.asarray(query_embeddings, dtype=np.float32).reshape(-1, self.dim))
+
+        while True:
+            with self._lock:
+                layout = self._layout
+                high = self._high
+                if high == 0:
+                    return {key: [[] for _ in queries] for key in ("ids", "metadatas", "distances")}
+                matrix = self._map()
+                live = np.asarray(self._live[:high], dtype=bool)
+                candidates = self._filter_rows(where, live) if where else None
+
+            available = int(np.count_nonzero(live)) if candidates is None else len(candidates)
+            k = max(0, min(n_results, available))
+            if k == 0:
+                ranked = [([], []) for _ in queries]
+            elif self._codes is not None:
+                ranked = self._rank_quantized(queries, matrix, high, live, candidates, k)
+            else:
+                ranked = self._rank_exact(queries, matrix, high, live, candidates, k)
+
+            with self._lock:
+                if self._layout != layout:
+                    continue
+                by_row = self._fetch_rows([row for rows, _ in ranked for row in rows])
+            break
+
+        result = {"ids": [], "metadatas": [], "distances": []}
+        for rows, distances in ranked:
+            # Rows deleted while scoring are dropped
+            hits = [(by_row[row], distance) for row, distance in zip(rows, distances) if row in by_row]
+            result["ids"].append([record[0] for record, _ in hits])
+            result["metadatas"].append([record[1] for record, _ in hits])
+            result["distances"].append([distance for _, distance in hits])
+        return result
+
+    @staticmethod
+    def _top(scores: np.ndarray, k: int) -> np.ndarray:
+        top = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+        return top[np.argsort(-scores[top], kind="stable")]
+
+    def _rank_exact(self, queries, matrix, high, live, candidates, k):
+        if candidates is None:
+            scores = queries @ matrix[:high].T
+            scores[:, ~live] = -np.inf
+        else:
+            scores = queries @ matrix[candidates].T
+
+        ranked = []
+        for row_scores in scores:
+            top = self._top(row_scores, k)
+            rows = (top if candidates is None else candidates[top]).tolist()
+            ranked.append((rows, [float(1.0 - score) for score in row_scores[top]]))
+        return ranked
+
+    def _rank_quantized(self, queries, matrix, high, live, candidates, k):
+        """Approximate scores from the int8 codes, then exact re-scoring of a shortlist"""
+        rows = np.arange(high) if candidates is None else candidates
+        approx = np.empty((len(queries), len(rows)), dtype=np.float32)
+        scratch = np.empty((min(QUANT_SCAN_ROWS, len(rows)), self.dim), dtype=np.float32)
+        for start in range(0, len(rows), QUANT_SCAN_ROWS):
+            chunk = rows[start:start + QUANT_SCAN_ROWS]
+            if candidates is None:
+                codes = self._codes[chunk[0]:chunk[-1] + 1]
+                scales = self._scales[chunk[0]:chunk[-1] + 1]
+            else:
+                codes, scales = self._codes[chunk], self._scales[chunk]
+            block = scratch[:len(chunk)]
+            block[...] = codes  # widened in place: BLAS has no int8 path
+            approx[:, start:start + len(chunk)] = (queries @ block.T) * scales
+        if candidates is None:
+            approx[:, ~live] = -np.inf
+
+        shortlist_size = min(len(rows), max(k * RERANK_FACTOR, RERANK_MIN))
+        ranked = []
+        for query, row_scores in zip(queries, approx):
+            shortlist = rows[self._top(row_scores, shortlist_size)]
+            if candidates is None:
+                shortlist = shortlist[live[shortlist]]
+            exact = matrix[shortlist] @ query
+            top = self._top(exact, min(k, len(shortlist)))
+            ranked.append((shortlist[top].tolist(), [float(1.0 - score) for score in exact[top]]))
+        return ranked
+
+    def text_search(self, text: str, n_results: int = 10, where: Optional[Dict] = None) -> Dict:
+        """
+        BM25 ranking of camera descriptions against free text. The inverted
+        index only visits cameras that contain a query term, so cost follows
+        the matching postings, not the registry size. Scores are FTS5 bm25
+        values: lower is better.
+        """
+        expression = _match_expression(text)
+        if expression is None or n_results < 1:
+            return {"ids": [], "scores": []}
+        clauses, params = _where_sql(where or {})
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT c.id, bm25(cameras_fts) AS score FROM cameras_fts "
+                "JOIN cameras c ON c.rowid = cameras_fts.rowid "
+                f"WHERE cameras_fts MATCH ? AND {clauses} ORDER BY score LIMIT ?",
+                [expression, *params, n_results]
+            ).fetchall()
+        return {"ids": [cam_id for cam_id, _ in rows], "scores": [score for _, score in rows]}
+
+    def hybrid_query(self, query_embedding, query_text: str, n_results: int = 1,
+                     where: Optional[Dict] = None, candidates: int = 50) -> Dict:
+        """
+        Fuse the vector and BM25 rankings with reciprocal rank fusion.
+
+        Each side contributes its top `candidates` hits only; every fused hit
+        is then given its cosine distance, so lexical-only matches report one too.
+        """
+        depth = max(candidates, n_results)
+        vector = self.query([query_embedding], n_results=depth, where=where)
+        lexical = self.text_search(query_text, n_results=depth, where=where)
+
+        fused: Dict[str, float] = {}
+        for ranking in (vector["ids"][0], lexical["ids"]):
+            for rank, cam_id in enumerate(ranking, start=1):
+                fused[cam_id] = fused.get(cam_id, 0.0) + 1.0 / (RRF_K + rank)
+        ranked = sorted(fused, key=fused.get, reverse=True)[:n_results]
+
+        query = self._normalize(np.asarray(query_embedding, dtype=np.float32).reshape(1, self.dim))[0]
+        with self._lock:
+            rows = self._rows_for_ids(ranked)
+            matrix = self._map()
+            records = self.get(ids=[cam_id for cam_id in ranked if cam_id in rows])
+            distances = {cam_id: float(1.0 - matrix[row] @ query) for cam_id, row in rows.items()}
+
+        return {
+            "ids": records["ids"],
+            "metadatas": records["metadatas"],
+            "distances": [distances[cam_id] for cam_id in records["ids"]],
+            "scores": [fused[cam_id] for cam_id in records["ids"]]
+        }
+
+    def near(self, lat: float, lon: float, k: Optional[int] = 10, radius_km: Optional[float] = None) -> Dict:
+        """
+        Cameras nearest to (lat, lon): the k closest, optionally limited to
+        radius_km, or every camera within radius_km when k is None.
+        Only cameras whose location is a coordinate pair are indexed.
+        """
+        with self._lock:
+            geo = self._geo_index()
+            if k is None:
+                hits = geo.within(lat, lon, radius_km)
+            else:
+                hits = geo.nearest(lat, lon, k, radius_km)
+            records = self.get(ids=[cam_id for cam_id, _ in hits]) if hits else {"ids": [], "metadatas": []}
+
+        distances = dict(hits)
+        return {
+            "ids": records["ids"],
+            "metadatas": records["metadatas"],
+            "distances_km": [distances[cam_id] for cam_id in records["ids"]]
+        }
+
+    def existing_ids(self, ids: List[str]) -> set:
+        """The subset of ids that are registered"""
+        with self._lock:
+            return set(self._rows_for_ids(list(set(ids))))
+
+    def delete(self, ids: List[str]) -> int:
+        """
+        Delete cameras with set-based statements and tombstone their rows;
+        nothing is moved, so this is proportional to len(ids). Returns the
+        number of cameras deleted.
+        """
+        with self._lock:
+            unique_ids = list(set(ids))
+            rows = self._rows_for_ids(unique_ids)
+            if not rows:
+                return 0
+            with self._db:
+                for start in range(0, len(unique_ids), 500):
+                    chunk = unique_ids[start:start + 500]
+                    placeholders = ",".join("?" * len(chunk))
+                    self._db.execute(f"DELETE FROM cameras WHERE id IN ({placeholders})", chunk)
+                self._bump_version()
+            self._map()
+            self._live[list(rows.values())] = 0
+            self._live.flush()
+            self._count -= len(rows)
+
+            if self._geo is not None:
+                for cam_id in rows:
+                    self._geo.remove(cam_id)
+            self._maybe_compact()
+            return len(rows)
+
+    def clear(self) -> int:
+        """Delete every camera; the whole matrix becomes free space at once"""
+        with self._lock:
+            cleared = self._count
+            with self._db:
+                self._db.execute("DELETE FROM cameras")
+                self._set_high(0)
+                self._bump_version()
+            self._map()
+            self._live[:] = 0
+            self._live.flush()
+            self._count = 0
+            self._layout += 1
+            if self._geo is not None:
+                self._geo = GeoGridIndex()
+            return cleared
+
+    # ----- compaction -----
+
+    def _maybe_compact(self):
+        dead = self._high - self._count
+        if self._compacting or dead < COMPACT_MIN_TOMBSTONES or dead <= COMPACT_TOMBSTONE_RATIO * self._high:
+            return
+        self._compacting = True
+        threading.Thread(target=self.compact, name="camera-store-compaction", daemon=True).start()
+
+    def compact(self):
+        """Reclaim tombstoned rows, one COMPACT_BATCH_ROWS step per lock acquisition"""
+        try:
+            while self._compact_step():
+                time.sleep(0)  # let waiting searches and writes take the lock
+        except Exception as e:
+            print(f"⚠️ Camera store compaction failed: {e}")
+        finally:
+            self._compacting = False
+
+    def _compact_step(self) -> bool:
+        """Move the last live rows into the earliest holes; False once rows are dense"""
+        with self._lock:
+            high = self._high
+            if high == 0:
+                return False
+            self._map()
+            live = np.asarray(self._live[:high], dtype=bool)
+            live_rows = np.flatnonzero(live)
+            dense = len(live_rows)
+            holes = np.flatnonzero(~live[:dense])[:COMPACT_BATCH_ROWS]
+            movers = live_rows[live_rows >= dense][::-1][:len(holes)]
+
+            if len(movers):
+                self._matrix[holes] = self._matrix[movers]
+                self._matrix.flush()
+                if self._codes is not None:
+                    self._codes[holes] = self._codes[movers]
+                    self._scales[holes] = self._scales[movers]
+                    self._codes.flush()
+                    self._scales.flush()
+                self._live[holes] = 1
+                self._live[movers] = 0
+            remaining = np.flatnonzero(self._live[:high])
+            new_high = int(remaining[-1]) + 1 if len(remaining) else 0
+
+            with self._db:
+                # Holes belong to no camera, so the UNIQUE row constraint never trips
+                self._db.executemany(
+                    "UPDATE cameras SET row = ? WHERE row = ?",
+                    zip(holes.tolist(), movers.tolist())
+                )
+                self._set_high(new_high)
+            self._live.flush()
+            self._layout += 1
+            return new_high > self._count
+
+    # ----- helpers -----
+
+    def _rows_for_ids(self, ids: List[str]) -> Dict[str, int]:
+        rows = {}
+        for start in range(0, len(ids), 500):
+            chunk = list(ids[start:start + 500])
+            placeholders = ",".join("?" * len(chunk))
+            rows.update(self._db.execute(f"SELECT id, row FROM cameras WHERE id IN ({placeholders})", chunk))
+        return rows
+
+    def _geo_index(self) -> GeoGridIndex:
+        if self._geo is None:
+            geo = GeoGridIndex()
+            for cam_id, location in self._db.execute("SELECT id, location FROM cameras WHERE location IS NOT NULL"):
+                point = parse_location(location)
+                if point:
+                    geo.add(cam_id, *point)
+            self._geo = geo
+        return self._geo
+
+    def _filter_rows(self, where: Dict, live: np.ndarray) -> np.ndarray:
+        """Live rows matching `where`, as a sorted array from a row bitmap"""
+        clauses, params = _where_sql(where)
+        matches = np.fromiter(
+            (row for (row,) in self._db.execute(f"SELECT row FROM cameras WHERE {clauses}", params)),
+            dtype=np.int64
+        )
+        bitmap = np.zeros(len(live), dtype=bool)
+        bitmap[matches[matches < len(live)]] = True
+        return np.flatnonzero(bitmap & live)
+
+    def _fetch_rows(self, rows: List[int]) -> Dict[int, tuple]:
+        found = {}
+        for start in range(0, len(rows), 500):
+            chunk = rows[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            found.update(
+                (row, (cam_id, json.loads(metadata)))
+                for row, cam_id, metadata in self._db.execute(
+                    f"SELECT row, id, metadata FROM cameras WHERE row IN ({placeholders})", chunk
+                )
+            )
+        return found
@@ -0,0 +1,215 @@
+"""
+Chroma Import for Trinetra
+One-time migration of the legacy chromadb `camera_streams` collection
+(chroma.sqlite3 plus its HNSW segment files) into the CameraStore
+"""
+
+import json
+import os
+import pickle
+import sqlite3
+import struct
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+# chromadb embeddings_queue operations
+OP_ADD, OP_UPDATE, OP_UPSERT, OP_DELETE = 0, 1, 2, 3
+
+# header.bin of chroma's persisted hnswlib segment: persist version, offsetLevel0,
+# max_elements, cur_element_count, size_data_per_element, label_offset,
+# offset_data, maxlevel, enterpoint_node, maxM, maxM0, M, mult, ef_construction
+HNSW_HEADER = struct.Struct("<i6Qii3QdQ")
+
+IMPORTED_FLAG = "imported_from_chroma"
+# JSON list of camera ids a previous import skipped; only these are retried
+PENDING_KEY = "chroma_import_pending"
+
+
+class _PickleStub:
+    """Stands in for chromadb classes so index_metadata.pickle loads without chromadb"""
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __setstate__(self, state):
+        if isinstance(state, dict):
+            self.__dict__.update(state)
+
+
+class _StubUnpickler(pickle.Unpickler):
+    def find_class(self, module, name):
+        if module.startswith("chromadb"):
+            return _PickleStub
+        return super().find_class(module, name)
+
+
+def _decode_value(string_value, int_value, float_value, bool_value):
+    if string_value is not None:
+        return string_value
+    if int_value is not None:
+        return int_value
+    if float_value is not None:
+        return float_value
+    if bool_value is not None:
+        return bool(bool_value)
+    return None
+
+
+def _read_metadata_segment(db: sqlite3.Connection) -> Dict[str, Dict]:
+    """Flushed records: {camera id: {"document": str, "metadata": dict}}"""
+    records = {}
+    internal_ids = {}
+    for internal_id, embedding_id in db.execute(
+        "SELECT e.id, e.embedding_id FROM embeddings e "
+        "JOIN segments s ON e.segment_id = s.id WHERE s.scope = 'METADATA'"
+    ):
+        internal_ids[internal_id] = embedding_id
+        records[embedding_id] = {"document": "", "metadata": {}}
+
+    for internal_id, key, string_value, int_value, float_value, bool_value in db.execute(
+        "SELECT id, key, string_value, int_value, float_value, bool_value FROM embedding_metadata"
+    ):
+        record = records.get(internal_ids.get(internal_id))
+        if record is None:
+            continue
+        value = _decode_value(string_value, int_value, float_value, bool_value)
+        if key == "chroma:document":
+            record["document"] = value or ""
+        elif not key.startswith("chroma:"):
+            record["metadata"][key] = value
+    return records
+
+
+def _read_hnsw_segment(segment_dir: str) -> Dict[str, np.ndarray]:
+    """Vectors persisted in the HNSW segment, keyed by camera id"""
+    header_path = os.path.join(segment_dir, "header.bin")
+    data_path = os.path.join(segment_dir, "data_level0.bin")
+    pickle_path = os.path.join(segment_dir, "index_metadata.pickle")
+    if not all(os.path.exists(p) for p in (header_path, data_path, pickle_path)):
+        return {}
+
+    with open(header_path, "rb") as f:
+        (_, _, _, element_count, element_size, label_offset, data_offset,
+         *_rest) = HNSW_HEADER.unpack(f.read(HNSW_HEADER.size))
+    if element_count == 0:
+        return {}
+
+    with open(pickle_path, "rb") as f:
+        persisted = _StubUnpickler(f).load()
+    label_to_id = getattr(persisted, "label_to_id", None) or (
+        persisted.get("label_to_id") if isinstance(persisted, dict) else None
+    ) or {}
+
+    dim = (label_offset - data_offset) // 4
+    raw = np.fromfile(data_path, dtype=np.uint8, count=element_count * element_size)
+    elements = raw.reshape(element_count, element_size)
+    vectors = elements[:, data_offset:label_offset].copy().view(np.float32).reshape(element_count, dim)
+    labels = elements[:, label_offset:label_offset + 8].copy().view(np.uint64).ravel()
+
+    return {
+        label_to_id[int(label)]: vectors[i]
+        for i, label in enumerate(labels)
+        if int(label) in label_to_id
+    }
+
+
+def _apply_queue(db: sqlite3.Connection, records: Dict[str, Dict], vectors: Dict[str, np.ndarray]):
+    """Replay the write-ahead embeddings_queue on top of the flushed segments"""
+    for cam_id, operation, vector, encoding, metadata in db.execute(
+        "SELECT id, operation, vector, encoding, metadata FROM embeddings_queue ORDER BY seq_id"
+    ):
+        if operation == OP_DELETE:
+            records.pop(cam_id, None)
+            vectors.pop(cam_id, None)
+            continue
+
+        record = records.setdefault(cam_id, {"document": "", "metadata": {}})
+        if metadata:
+            fields = json.loads(metadata)
+            if "chroma:document" in fields:
+                record["document"] = fields.pop("chroma:document") or ""
+            fields = {k: v for k, v in fields.items() if not k.startswith("chroma:")}
+            if operation == OP_UPDATE:
+                record["metadata"].update(fields)
+            else:
+                record["metadata"] = fields
+        if vector is not None and (encoding or "FLOAT32").upper() == "FLOAT32":
+            vectors[cam_id] = np.frombuffer(vector, dtype=np.float32)
+
+
+def import_chroma(store, chroma_dir: str,
+                  embed_fn: Optional[Callable[[List[str]], List[Optional[List[float]]]]] = None) -> int:
+    """
+    Copy every camera from a chromadb persist directory into `store`.
+
+    Vectors whose dimension does not match the store (the legacy collection
+    used 1536-d embeddings) are re-embedded from their description with one
+    batched embed_fn call (texts -> embeddings, None for a failure), or
+    skipped when embed_fn is not given. Skipped cameras are remembered and
+    retried on the next call, unless they were registered or deleted through
+    the API since (see forget_pending); the import is done once nothing is
+    skipped.
+    """
+    db_path = os.path.join(chroma_dir, "chroma.sqlite3")
+    if store.get_meta(IMPORTED_FLAG) or not os.path.exists(db_path):
+        return 0
+    pending = store.get_meta(PENDING_KEY)
+
+    db = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        records = _read_metadata_segment(db)
+        vectors = {}
+        for (segment_id,) in db.execute("SELECT id FROM segments WHERE scope = 'VECTOR'"):
+            vectors.update(_read_hnsw_segment(os.path.join(chroma_dir, segment_id)))
+        _apply_queue(db, records, vectors)
+    finally:
+        db.close()
+
+    if pending is not None:
+        retry = set(json.loads(pending))
+        retry -= store.existing_ids(list(retry))
+        records = {cam_id: record for cam_id, record in records.items() if cam_id in retry}
+
+    stale = [cam_id for cam_id in records
+             if vectors.get(cam_id) is None or len(vectors[cam_id]) != store.dim]
+    if stale and embed_fn is not None:
+        texts = [records[cam_id]["metadata"].get("description") or records[cam_id]["document"]
+                 for cam_id in stale]
+        for cam_id, vector in zip(stale, embed_fn(texts)):
+            if vector is not None and any(vector):
+                vectors[cam_id] = vector
+
+    ids, documents, metadatas, embeddings, skipped = [], [], [], [], []
+    for cam_id, record in records.items():
+        vector = vectors.get(cam_id)
+        if vector is None or len(vector) != store.dim:
+            reason = "re-embedding failed" if embed_fn else f"no {store.dim}-d embedding to import"
+            print(f"⚠️ Skipping camera {cam_id}: {reason}")
+            skipped.append(cam_id)
+            continue
+        ids.append(cam_id)
+        documents.append(record["document"])
+        metadatas.append(record["metadata"])
+        embeddings.append(vector)
+
+    store.add(ids=ids, documents=documents, metadatas=metadatas, embeddings=embeddings)
+    if skipped:
+        store.set_meta(PENDING_KEY, json.dumps(skipped))
+    else:
+        store.set_meta(IMPORTED_FLAG, "1")
+    return len(ids)
+
+
+def forget_pending(store, ids: Optional[List[str]] = None):
+    """
+    Stop retrying these skipped cameras (all of them when ids is None):
+    they were registered, deleted or cleared through the API, and the
+    legacy record must not overwrite or resurrect them.
+    """
+    pending = store.get_meta(PENDING_KEY)
+    if not pending:
+        return
+    gone = None if ids is None else set(ids)
+    keep = [] if gone is None else [cam_id for cam_id in json.loads(pending) if cam_id not in gone]
+    store.set_meta(PENDING_KEY, json.dumps(keep))
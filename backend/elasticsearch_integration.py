@@ -3,7 +3,7 @@ Elasticsearch Integration for Trinetra AI System
 Handles CCTV footage metadata, analysis results, and transaction logs
 """
 
-from elasticsearch import Elasticsearch
+from elasticsearch import Elasticsearch, helpers
 from datetime import datetime
 import json
 import os
@@ -143,10 +143,9 @@ class ElasticsearchManager:
             )
             print(f"✅ Created index: {orchestration_index}")
     
-    def log_cctv_footage(self, camera_id, camera_name, location, stream_url, 
-                         frame_snapshot_url=None, metadata=None, tx_hash=None, ipfs_cid=None):
-        """Log CCTV footage metadata"""
-        doc = {
+    def _cctv_footage_doc(self, camera_id, camera_name, location, stream_url,
+                          frame_snapshot_url=None, metadata=None, tx_hash=None, ipfs_cid=None):
+        return {
             "camera_id": camera_id,
             "camera_name": camera_name,
             "location": location,
@@ -157,6 +156,12 @@ class ElasticsearchManager:
             "blockchain_tx": tx_hash,
             "ipfs_cid": ipfs_cid
         }
+
+    def log_cctv_footage(self, camera_id, camera_name, location, stream_url, 
+                         frame_snapshot_url=None, metadata=None, tx_hash=None, ipfs_cid=None):
+        """Log CCTV footage metadata"""
+        doc = self._cctv_footage_doc(camera_id, camera_name, location, stream_url,
+                                     frame_snapshot_url, metadata, tx_hash, ipfs_cid)
         
         result = self.client.index(index="trinetra-cctv-footage", document=doc)
         return result['_id']
@@ -185,11 +190,10 @@ class ElasticsearchManager:
         result = self.client.index(index="trinetra-ai-analysis", document=doc)
         return result['_id']
     
-    def log_transaction(self, transaction_type, user_address, blockchain, 
-                       tx_hash, status, details=None, gas_used=None, 
-                       related_camera_id=None):
-        """Log blockchain transaction"""
-        doc = {
+    def _transaction_doc(self, transaction_type, user_address, blockchain,
+                         tx_hash, status, details=None, gas_used=None,
+                         related_camera_id=None):
+        return {
             "transaction_id": f"tx-{datetime.utcnow().timestamp()}",
             "timestamp": datetime.utcnow().isoformat(),
             "transaction_type": transaction_type,
@@ -201,10 +205,38 @@ class ElasticsearchManager:
             "gas_used": gas_used,
             "related_camera_id": related_camera_id
         }
+
+    def log_transaction(self, transaction_type, user_address, blockchain, 
+                       tx_hash, status, details=None, gas_used=None, 
+                       related_camera_id=None):
+        """Log blockchain transaction"""
+        doc = self._transaction_doc(transaction_type, user_address, blockchain,
+                                    tx_hash, status, details, gas_used, related_camera_id)
         
         result = self.client.index(index="trinetra-transactions", document=doc)
         return result['_id']
     
+    def bulk_log(self, cctv_footage=None, transactions=None):
+        """
+        Log many footage and transaction entries in one bulk request.
+        Each entry holds the keyword arguments of log_cctv_footage / log_transaction.
+        Returns the number of documents indexed.
+        """
+        actions = [
+            {"_index": "trinetra-cctv-footage", "_source": self._cctv_footage_doc(**entry)}
+            for entry in cctv_footage or []
+        ] + [
+            {"_index": "trinetra-transactions", "_source": self._transaction_doc(**entry)}
+            for entry in transactions or []
+        ]
+        if not actions:
+            return 0
+        
+        indexed, errors = helpers.bulk(self.client, actions, raise_on_error=False)
+        if errors:
+            print(f"⚠️ {len(errors)} Elasticsearch bulk actions failed")
+        return indexed
+    
     def log_orchestration(self, context_id, user_prompt, status, tasks, 
                          thought_process, agents_used, execution_time_ms, 
                          final_result):
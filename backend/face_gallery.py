@@ -0,0 +1,400 @@
+"""
+Known-Face Gallery for Trinetra
+Encodings of the images in known_faces/ kept as one N x 128 array on disk,
+re-encoding only the files that were added or changed
+"""
+
+import hashlib
+import io
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from face_index import IVFIndex
+from face_pipeline import detect_and_encode
+from image_io import decode_image
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+ENCODING_DIM = 128
+DEFAULT_TOLERANCE = 0.6  # face_recognition.compare_faces default
+# Nearest encodings fetched from the ANN index before picking identity and margin
+ANN_CANDIDATES = 32
+# Seconds between background rescans of faces_dir (see FaceGallery.watch)
+REFRESH_INTERVAL = float(os.getenv("FACE_GALLERY_REFRESH_SECONDS", "30"))
+
+
+def file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def encode_face_file(path_or_file) -> Optional[np.ndarray]:
+    """
+    Encoding of the largest face in an image (a path or file object), or
+    None when no face is found. Reference photos may show bystanders; the
+    enrolled person is assumed to be the most prominent face.
+    """
+    import face_recognition  # dlib models load on first use, not on import of this module
+
+    image = face_recognition.load_image_file(path_or_file)
+    locations = face_recognition.face_locations(image)
+    if not locations:
+        return None
+    largest = max(locations, key=lambda box: (box[2] - box[0]) * (box[1] - box[3]))
+    return face_recognition.face_encodings(image, [largest])[0]
+
+
+def encode_face_bytes(data: bytes) -> Optional[np.ndarray]:
+    """encode_face_file for in-memory image bytes; picklable for process pools"""
+    return encode_face_file(io.BytesIO(data))
+
+
+def detect_faces_bytes(data: bytes, config: Optional[Dict] = None):
+    """
+    (boxes, encodings, skipped) for in-memory image bytes through the
+    two-stage face pipeline; picklable for process pools.
+    """
+    return detect_and_encode(np.array(decode_image(data)), config)
+
+
+def image_extension(data: bytes) -> str:
+    return ".png" if data.startswith(b"\x89PNG") else ".jpg"
+
+
+def match_encodings(probes, names: List[str], matrix: np.ndarray, labels: Optional[np.ndarray] = None,
+                    tolerance: float = DEFAULT_TOLERANCE) -> List[Dict]:
+    """
+    Closest known identity for every probe encoding, from one probes x gallery
+    distance matrix. Each result has name (None above tolerance), the best
+    distance, and margin: how much further the closest *other* identity is.
+    labels are per-row identity ids; computed from names when not given.
+    """
+    probes = np.asarray(probes, dtype=np.float64).reshape(-1, ENCODING_DIM)
+    if len(probes) == 0:
+        return []
+    if len(names) == 0:
+        return [{"name": None, "distance": None, "margin": None} for _ in probes]
+    if labels is None:
+        labels = np.unique(names, return_inverse=True)[1]
+
+    # |p - g|^2 = |p|^2 + |g|^2 - 2 p.g, one BLAS call for all pairs
+    squared = (probes ** 2).sum(axis=1)[:, None] + (matrix ** 2).sum(axis=1)[None, :] - 2.0 * probes @ matrix.T
+    distances = np.sqrt(np.maximum(squared, 0.0))
+    best = distances.argmin(axis=1)
+    best_distance = distances[np.arange(len(probes)), best]
+
+    others = np.where(labels[None, :] == labels[best][:, None], np.inf, distances)
+    runner_up = others.min(axis=1)
+
+    return [
+        {
+            "name": names[row] if distance <= tolerance else None,
+            "distance": float(distance),
+            "margin": float(second - distance) if np.isfinite(second) else None
+        }
+        for row, distance, second in zip(best, best_distance, runner_up)
+    ]
+
+
+class FaceGallery:
+    """
+    One row per known-face image: name, encoding and the path/mtime/hash the
+    encoding was computed from. known_faces/<Name>.jpg is a single reference
+    image; known_faces/<Name>/*.jpg holds several for one identity, and a
+    probe's distance to an identity is its distance to the closest of them.
+
+    refresh() re-encodes a file only when its mtime changed and its content
+    hash no longer matches, then writes the cache back atomically. It scans
+    and encodes without holding the gallery lock and runs on the watch()
+    thread, not per request. Readers use snapshot(), which never blocks on a
+    refresh in progress. Large galleries are searched through an IVF index
+    kept next to the cache.
+    """
+
+    def __init__(self, faces_dir: str, cache_path: str, index_path: Optional[str] = None):
+        self.faces_dir = faces_dir
+        self.cache_path = cache_path
+        self.index_path = index_path or os.path.join(os.path.dirname(cache_path), "face_index.npz")
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()  # one scan of faces_dir at a time
+        self._save_lock = threading.Lock()  # one cache/index writer at a time
+        self._entries: Dict[str, Dict] = {}  # path -> {name, mtime, hash, encoding}
+        # (names, N x 128 encodings, per-row identity labels, path -> row)
+        self._snapshot = ([], np.zeros((0, ENCODING_DIM)), np.zeros(0, dtype=np.intp), {})
+        self.index = IVFIndex(ENCODING_DIM)
+        self._load_cache()
+        self._load_index()
+
+    def _load_cache(self):
+        if not os.path.exists(self.cache_path):
+            return
+        try:
+            with np.load(self.cache_path, allow_pickle=False) as cache:
+                for path, name, mtime, content_hash, has_face, encoding in zip(
+                    cache["paths"], cache["names"], cache["mtimes"],
+                    cache["hashes"], cache["has_face"], cache["encodings"]
+                ):
+                    self._entries[str(path)] = {
+                        "name": str(name),
+                        "mtime": float(mtime),
+                        "hash": str(content_hash),
+                        "encoding": encoding if has_face else None
+                    }
+        except (OSError, KeyError, ValueError) as e:
+            print(f"⚠️ Ignoring unreadable face gallery cache {self.cache_path}: {e}")
+            self._entries = {}
+        self._publish()
+
+    def _load_index(self):
+        encoded = {path for path, entry in self._entries.items() if entry["encoding"] is not None}
+        try:
+            if self.index.load(self.index_path) and set(self.index.keys()) == encoded:
+                return
+        except (OSError, KeyError, ValueError) as e:
+            print(f"⚠️ Ignoring unreadable face index {self.index_path}: {e}")
+        # Missing or out of step with the gallery cache: rebuild from the encodings
+        self.index = IVFIndex(ENCODING_DIM)
+        self._update_index(encoded, set())
+
+    def _update_index(self, added, removed):
+        self.index.remove(list(removed))
+        paths = sorted(added)
+        self.index.add(paths, [self._entries[path]["encoding"] for path in paths])
+
+    def _save_cache(self, entries_by_path: Dict[str, Dict]):
+        paths = sorted(entries_by_path)
+        entries = [entries_by_path[path] for path in paths]
+        os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+        tmp_path = self.cache_path + ".tmp.npz"
+        np.savez(
+            tmp_path,
+            paths=np.array(paths, dtype=str),
+            names=np.array([entry["name"] for entry in entries], dtype=str),
+            mtimes=np.array([entry["mtime"] for entry in entries], dtype=np.float64),
+            hashes=np.array([entry["hash"] for entry in entries], dtype=str),
+            has_face=np.array([entry["encoding"] is not None for entry in entries], dtype=bool),
+            encodings=np.array(
+                [entry["encoding"] if entry["encoding"] is not None else np.zeros(ENCODING_DIM)
+                 for entry in entries],
+                dtype=np.float64
+            ).reshape(-1, ENCODING_DIM)
+        )
+        os.replace(tmp_path, self.cache_path)
+
+    def _publish(self):
+        rows = sorted(
+            ({**entry, "path": path} for path, entry in self._entries.items() if entry["encoding"] is not None),
+            key=lambda entry: entry["name"]
+        )
+        names = [entry["name"] for entry in rows]
+        matrix = np.array([entry["encoding"] for entry in rows], dtype=np.float64).reshape(-1, ENCODING_DIM)
+        labels = np.unique(names, return_inverse=True)[1] if names else np.zeros(0, dtype=np.intp)
+        rows_by_path = {entry["path"]: row for row, entry in enumerate(rows)}
+        # A single reference swap, so readers see the old or the new gallery
+        self._snapshot = (names, matrix, labels, rows_by_path)
+
+    def _scan(self) -> Dict[str, Tuple[str, float]]:
+        """{image path: (identity name, file mtime)}"""
+        files = {}
+        try:
+            top = list(os.scandir(self.faces_dir))
+        except FileNotFoundError:
+            return files
+        for entry in top:
+            if entry.is_dir():
+                for image in os.scandir(entry.path):
+                    if image.name.lower().endswith(IMAGE_EXTENSIONS):
+                        files[image.path] = (entry.name, image.stat().st_mtime)
+            elif entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                files[entry.path] = (os.path.splitext(entry.name)[0], entry.stat().st_mtime)
+        return files
+
+    def refresh(self, force: bool = False) -> int:
+        """
+        Bring the gallery in line with faces_dir; returns how many files were
+        (re-)encoded. Every image is stat'ed (a file overwritten in place
+        keeps its directory's mtime), but only files whose mtime changed are
+        hashed, and only those whose content changed are encoded. The lock is
+        held only to copy the entries and to swap in the result; files that
+        enroll() or remove() touched meanwhile keep their newer state.
+        """
+        with self._refresh_lock:
+            with self._lock:
+                known = dict(self._entries)
+            files = self._scan()
+
+            updates, encoded = {}, set()
+            for path, (name, mtime) in files.items():
+                entry = known.get(path)
+                if not force and entry is not None and entry["mtime"] == mtime:
+                    continue
+
+                content_hash = file_digest(path)
+                if entry is not None and entry["hash"] == content_hash:
+                    updates[path] = {**entry, "mtime": mtime}  # touched, not changed
+                    continue
+
+                try:
+                    encoding = encode_face_file(path)
+                except Exception as e:
+                    print(f"⚠️ Could not encode known face {path}: {e}")
+                    encoding = None
+                if encoding is None:
+                    print(f"⚠️ No face found in {path}")
+                updates[path] = {
+                    "name": name,
+                    "mtime": mtime,
+                    "hash": content_hash,
+                    "encoding": encoding
+                }
+                encoded.add(path)
+            gone = set(known) - set(files)
+            if not updates and not gone:
+                return 0
+
+            with self._lock:
+                added, removed = set(), set()
+                for path, entry in updates.items():
+                    if self._entries.get(path) is not known.get(path):
+                        continue  # enrolled or removed while this refresh ran
+                    self._entries[path] = entry
+                    if path in encoded:
+                        (added if entry["encoding"] is not None else removed).add(path)
+                for path in gone:
+                    if self._entries.get(path) is known[path]:
+                        del self._entries[path]
+                        removed.add(path)
+                self._swap(added, removed)
+            self._persist()
+            if encoded:
+                print(f"✅ Face gallery: encoded {len(encoded)} file(s), {len(self._snapshot[0])} known faces")
+            return len(encoded)
+
+    def watch(self, interval: float = REFRESH_INTERVAL):
+        """Refresh every `interval` seconds on a daemon thread, so requests never scan faces_dir"""
+        def loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.refresh()
+                except Exception as e:
+                    print(f"⚠️ Face gallery refresh failed: {e}")
+
+        threading.Thread(target=loop, name="face-gallery-refresh", daemon=True).start()
+
+    def _persist(self):
+        """Write the cache and index as of now; called without the gallery lock held"""
+        with self._save_lock:
+            with self._lock:
+                entries = dict(self._entries)
+            try:
+                self._save_cache(entries)
+                self.index.save(self.index_path)
+            except OSError as e:
+                print(f"⚠️ Could not write face gallery cache: {e}")
+
+    def _swap(self, added, removed):
+        """Apply entry changes to the index and snapshot; caller holds the gallery lock"""
+        # Index first, then the snapshot: identify() ignores index hits the snapshot lacks
+        self._update_index(added, removed)
+        self._publish()
+
+    def _identity_dir(self, name: str) -> str:
+        if not name or name.startswith(".") or os.path.basename(name) != name:
+            raise ValueError(f"Invalid identity name: {name!r}")
+        return os.path.join(self.faces_dir, name)
+
+    def enroll(self, name: str, images: List[Tuple[bytes, np.ndarray]]) -> List[str]:
+        """
+        Add already-encoded reference images for an identity: the images are
+        written to known_faces/<name>/ and swapped into the live gallery and
+        index in one step. Returns the reference ids, usable with remove().
+        The lock is held only for the swap; the cache is written after it.
+        """
+        identity_dir = self._identity_dir(name)
+        os.makedirs(identity_dir, exist_ok=True)
+        entries = {}
+        for data, encoding in images:
+            content_hash = hashlib.sha256(data).hexdigest()
+            path = os.path.join(identity_dir, content_hash[:16] + image_extension(data))
+            with open(path, "wb") as f:
+                f.write(data)
+            entries[path] = {
+                "name": name,
+                "mtime": os.stat(path).st_mtime,
+                "hash": content_hash,
+                "encoding": np.asarray(encoding, dtype=np.float64)
+            }
+        if entries:
+            with self._lock:
+                self._entries.update(entries)
+                self._swap(set(entries), set())
+            self._persist()
+        return [os.path.splitext(os.path.basename(path))[0] for path in sorted(entries)]
+
+    def remove(self, name: str, references: Optional[List[str]] = None) -> int:
+        """
+        Remove an identity, or only the given reference ids (file names
+        without extension) of it. Returns the number of images removed.
+        The cache is written after the lock is released.
+        """
+        identity_dir = self._identity_dir(name)
+        with self._lock:
+            doomed = [
+                path for path, entry in self._entries.items()
+                if entry["name"] == name
+                and (references is None or os.path.splitext(os.path.basename(path))[0] in references)
+            ]
+            for path in doomed:
+                del self._entries[path]
+                try:
+                    os.remove(path)  # under the lock, so a concurrent refresh can't re-add it
+                except FileNotFoundError:
+                    pass
+            if doomed:
+                self._swap(set(), set(doomed))
+
+        try:
+            if os.path.isdir(identity_dir) and not os.listdir(identity_dir):
+                os.rmdir(identity_dir)
+        except OSError:
+            pass  # an enroll wrote into it meanwhile
+        if doomed:
+            self._persist()
+        return len(doomed)
+
+    def references(self, name: str) -> int:
+        """Number of encoded reference images for an identity, from the published snapshot"""
+        return self._snapshot[0].count(name)
+
+    def snapshot(self) -> Tuple[List[str], np.ndarray]:
+        """(names, N x 128 encodings) as of the last refresh"""
+        names, matrix, _, _ = self._snapshot
+        return names, matrix
+
+    def identify(self, probes, tolerance: float = DEFAULT_TOLERANCE) -> List[Dict]:
+        """
+        match_encodings against the current snapshot: the whole gallery for
+        small galleries, otherwise the ANN index's nearest candidates only.
+        """
+        names, matrix, labels, rows_by_path = self._snapshot
+        probes = np.asarray(probes, dtype=np.float64).reshape(-1, ENCODING_DIM)
+        if len(names) < self.index.exact_max or not self.index.trained:
+            return match_encodings(probes, names, matrix, labels, tolerance)
+
+        results = []
+        for probe, (paths, _) in zip(probes, self.index.search(probes, k=ANN_CANDIDATES)):
+            rows = [rows_by_path[path] for path in paths if path in rows_by_path]
+            results.extend(match_encodings(
+                probe, [names[row] for row in rows], matrix[rows], labels[rows], tolerance
+            ))
+        return results
+
+    def __len__(self):
+        return len(self._snapshot[0])
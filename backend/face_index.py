@@ -0,0 +1,219 @@
+"""
+Approximate Face Index for Trinetra
+Inverted-file (IVF) index over 128-d face encodings: k-means cells, search
+probes the closest cells only; small galleries are searched exactly
+"""
+
+import math
+import os
+import threading
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+# Below this many encodings a full scan is fast enough and exact
+EXACT_SEARCH_MAX = 20000
+# Retrain once the gallery has grown this much since the cells were computed
+RETRAIN_GROWTH = 4.0
+KMEANS_ITERATIONS = 12
+KMEANS_SAMPLE_PER_CELL = 64
+ASSIGN_CHUNK = 16384
+
+
+def _squared_distances(points: np.ndarray, centers: np.ndarray) -> np.ndarray:
+    return (
+        (points ** 2).sum(axis=1)[:, None] + (centers ** 2).sum(axis=1)[None, :] - 2.0 * points @ centers.T
+    )
+
+
+def _assign(points: np.ndarray, centers: np.ndarray) -> np.ndarray:
+    cells = np.empty(len(points), dtype=np.int64)
+    for start in range(0, len(points), ASSIGN_CHUNK):
+        chunk = points[start:start + ASSIGN_CHUNK]
+        cells[start:start + len(chunk)] = _squared_distances(chunk, centers).argmin(axis=1)
+    return cells
+
+
+def kmeans(points: np.ndarray, cells: int, seed: int = 0) -> np.ndarray:
+    """Lloyd's k-means on a sample of points; empty cells are re-seeded from random points"""
+    rng = np.random.default_rng(seed)
+    sample_size = min(len(points), cells * KMEANS_SAMPLE_PER_CELL)
+    sample = points[rng.choice(len(points), sample_size, replace=False)]
+    centers = sample[rng.choice(sample_size, cells, replace=False)].copy()
+    for _ in range(KMEANS_ITERATIONS):
+        assignment = _assign(sample, centers)
+        counts = np.bincount(assignment, minlength=cells)
+        sums = np.zeros_like(centers)
+        np.add.at(sums, assignment, sample)
+        filled = counts > 0
+        centers[filled] = sums[filled] / counts[filled, None]
+        empty = np.flatnonzero(~filled)
+        if len(empty):
+            centers[empty] = sample[rng.choice(sample_size, len(empty), replace=False)]
+    return centers
+
+
+class IVFIndex:
+    """
+    Encodings keyed by string, bucketed into nlist k-means cells.
+
+    Writers build new per-cell arrays and swap a single state tuple, so a
+    search always sees one consistent version and never waits on enroll or
+    remove. Until the gallery reaches exact_max entries, or before the first
+    training, search() scans everything exactly.
+    """
+
+    def __init__(self, dim: int = 128, nprobe: int = 16, exact_max: int = EXACT_SEARCH_MAX):
+        self.dim = dim
+        self.nprobe = nprobe
+        self.exact_max = exact_max
+        self._lock = threading.Lock()
+        self._trained_size = 0
+        # (centroids or None, per-cell vectors, per-cell keys, key -> cell)
+        self._state = (None, (np.zeros((0, dim), dtype=np.float32),), (np.zeros(0, dtype=object),), {})
+
+    def __len__(self):
+        return len(self._state[3])
+
+    @property
+    def trained(self) -> bool:
+        return self._state[0] is not None
+
+    def keys(self) -> List[str]:
+        return list(self._state[3])
+
+    # ----- updates -----
+
+    def add(self, keys: List[str], vectors):
+        """Insert or replace encodings"""
+        if not keys:
+            return
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        with self._lock:
+            self._remove_locked(keys)
+            centroids, cell_vectors, cell_keys, cell_of = self._state
+            assignment = _assign(vectors, centroids) if centroids is not None else np.zeros(len(keys), dtype=np.int64)
+            cell_vectors, cell_keys, cell_of = list(cell_vectors), list(cell_keys), dict(cell_of)
+            for cell in np.unique(assignment):
+                members = np.flatnonzero(assignment == cell)
+                cell_vectors[cell] = np.concatenate([cell_vectors[cell], vectors[members]])
+                cell_keys[cell] = np.concatenate([cell_keys[cell], np.array([keys[i] for i in members], dtype=object)])
+                cell_of.update((keys[i], int(cell)) for i in members)
+            self._state = (centroids, tuple(cell_vectors), tuple(cell_keys), cell_of)
+            if self._should_train():
+                self._train_locked()
+
+    def remove(self, keys: List[str]):
+        with self._lock:
+            self._remove_locked(keys)
+
+    def _remove_locked(self, keys: List[str]):
+        centroids, cell_vectors, cell_keys, cell_of = self._state
+        affected = {}
+        for key in keys:
+            cell = cell_of.get(key)
+            if cell is not None:
+                affected.setdefault(cell, set()).add(key)
+        if not affected:
+            return
+        cell_vectors, cell_keys, cell_of = list(cell_vectors), list(cell_keys), dict(cell_of)
+        for cell, gone in affected.items():
+            keep = np.array([key not in gone for key in cell_keys[cell]], dtype=bool)
+            cell_vectors[cell] = cell_vectors[cell][keep]
+            cell_keys[cell] = cell_keys[cell][keep]
+            for key in gone:
+                del cell_of[key]
+        self._state = (centroids, tuple(cell_vectors), tuple(cell_keys), cell_of)
+
+    def _should_train(self) -> bool:
+        size = len(self._state[3])
+        if size < self.exact_max:
+            return False
+        return not self.trained or size >= RETRAIN_GROWTH * self._trained_size
+
+    def train(self):
+        """Recompute the cells from every stored encoding"""
+        with self._lock:
+            self._train_locked()
+
+    def _train_locked(self):
+        _, cell_vectors, cell_keys, _ = self._state
+        vectors = np.concatenate(cell_vectors)
+        keys = np.concatenate(cell_keys)
+        if len(vectors) == 0:
+            return
+        nlist = max(1, min(len(vectors) // 8, int(4 * math.sqrt(len(vectors)))))
+        print(f"🔧 Training face index: {len(vectors)} encodings into {nlist} cells")
+        centroids = kmeans(vectors, nlist)
+        self._state = (centroids, *self._group(vectors, keys, centroids, nlist))
+        self._trained_size = len(vectors)
+
+    def _group(self, vectors: np.ndarray, keys: np.ndarray, centroids: np.ndarray, nlist: int):
+        assignment = _assign(vectors, centroids)
+        order = np.argsort(assignment, kind="stable")
+        bounds = np.searchsorted(assignment[order], np.arange(nlist + 1))
+        cell_vectors = tuple(vectors[order[bounds[c]:bounds[c + 1]]] for c in range(nlist))
+        cell_keys = tuple(keys[order[bounds[c]:bounds[c + 1]]] for c in range(nlist))
+        cell_of = {key: int(cell) for key, cell in zip(keys, assignment)}
+        return cell_vectors, cell_keys, cell_of
+
+    # ----- search -----
+
+    def search(self, probes, k: int = 10, exact: Optional[bool] = None) -> List[Tuple[List[str], np.ndarray]]:
+        """
+        (keys, distances) of the k closest encodings for each probe, nearest
+        first. exact=None picks the exact scan for small or untrained indexes.
+        """
+        probes = np.asarray(probes, dtype=np.float32).reshape(-1, self.dim)
+        centroids, cell_vectors, cell_keys, cell_of = self._state
+        if exact is None:
+            exact = centroids is None or len(cell_of) < self.exact_max
+
+        results = []
+        if exact:
+            vectors, keys = np.concatenate(cell_vectors), np.concatenate(cell_keys)
+        for probe in probes:
+            if not exact:
+                nearest_cells = np.argsort(_squared_distances(probe[None, :], centroids)[0])[:self.nprobe]
+                vectors = np.concatenate([cell_vectors[c] for c in nearest_cells])
+                keys = np.concatenate([cell_keys[c] for c in nearest_cells])
+            if len(keys) == 0:
+                results.append(([], np.zeros(0)))
+                continue
+            squared = _squared_distances(probe[None, :], vectors)[0]
+            top = np.argpartition(squared, k - 1)[:k] if k < len(squared) else np.arange(len(squared))
+            top = top[np.argsort(squared[top], kind="stable")]
+            results.append((keys[top].tolist(), np.sqrt(np.maximum(squared[top], 0.0))))
+        return results
+
+    # ----- persistence -----
+
+    def save(self, path: str):
+        centroids, cell_vectors, cell_keys, _ = self._state
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = path + ".tmp.npz"
+        np.savez(
+            tmp_path,
+            centroids=centroids if centroids is not None else np.zeros((0, self.dim), dtype=np.float32),
+            vectors=np.concatenate(cell_vectors).astype(np.float32).reshape(-1, self.dim),
+            keys=np.concatenate(cell_keys).astype(str),
+            trained_size=np.array(self._trained_size)
+        )
+        os.replace(tmp_path, path)
+
+    def load(self, path: str) -> bool:
+        """Replace the contents with a saved index; False if there is none"""
+        if not os.path.exists(path):
+            return False
+        with np.load(path, allow_pickle=False) as saved:
+            centroids = saved["centroids"]
+            vectors = saved["vectors"]
+            keys = saved["keys"].astype(object)
+            trained_size = int(saved["trained_size"])
+        with self._lock:
+            if len(centroids):
+                self._state = (centroids, *self._group(vectors, keys, centroids, len(centroids)))
+            else:
+                self._state = (None, (vectors,), (keys,), {key: 0 for key in keys})
+            self._trained_size = trained_size
+        return True
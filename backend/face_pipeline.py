@@ -0,0 +1,98 @@
+"""
+Face Detection Pipeline for Trinetra
+Detect faces on a downscaled copy of the frame, map the boxes back and
+encode only full-resolution crops that are large and sharp enough
+"""
+
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+# Defaults for every camera; a camera's metadata["face_detection"] overrides any of them
+DEFAULT_DETECTION = {
+    "model": os.getenv("FACE_DETECTION_MODEL", "hog"),  # "hog" (CPU) or "cnn" (GPU)
+    "max_side": int(os.getenv("FACE_DETECTION_MAX_SIDE", "1280")),  # detection copy's longest side, 0 = full size
+    "upsample": 1,  # dlib upsampling passes on the detection copy
+    "min_face_px": 20,  # shorter box side at full resolution
+    "min_sharpness": 0.0,  # variance of the Laplacian of the grey crop, 0 = no blur filter
+    "jitters": 1,  # re-samples per encoding
+}
+
+
+def detection_config(overrides: Optional[Dict] = None) -> Dict:
+    """DEFAULT_DETECTION with known keys from overrides (a camera's "face_detection" metadata)"""
+    config = dict(DEFAULT_DETECTION)
+    for key, value in (overrides or {}).items():
+        if key not in DEFAULT_DETECTION:
+            raise ValueError(f"Unknown face_detection setting '{key}'; valid: {', '.join(DEFAULT_DETECTION)}")
+        config[key] = type(DEFAULT_DETECTION[key])(value)
+    if config["model"] not in ("hog", "cnn"):
+        raise ValueError("face_detection model must be 'hog' or 'cnn'")
+    return config
+
+
+def sharpness(gray: np.ndarray) -> float:
+    """Variance of the 4-neighbour Laplacian; low values mean a blurred crop"""
+    if gray.shape[0] < 3 or gray.shape[1] < 3:
+        return 0.0
+    gray = gray.astype(np.float32)
+    laplacian = (
+        gray[:-2, 1:-1] + gray[2:, 1:-1] + gray[1:-1, :-2] + gray[1:-1, 2:] - 4.0 * gray[1:-1, 1:-1]
+    )
+    return float(laplacian.var())
+
+
+def detect_faces(image: np.ndarray, config: Optional[Dict] = None) -> Tuple[List[Tuple[int, int, int, int]], Dict]:
+    """
+    Face boxes (top, right, bottom, left) at full resolution that pass the
+    size and sharpness filters, plus counts of what was skipped.
+    """
+    import face_recognition
+
+    config = config or DEFAULT_DETECTION
+    height, width = image.shape[:2]
+    scale = 1.0
+    if config["max_side"] and max(height, width) > config["max_side"]:
+        scale = config["max_side"] / max(height, width)
+
+    if scale < 1.0:
+        small = np.asarray(
+            Image.fromarray(image).resize((round(width * scale), round(height * scale)), Image.BILINEAR)
+        )
+    else:
+        small = image
+    boxes = face_recognition.face_locations(small, number_of_times_to_upsample=config["upsample"],
+                                            model=config["model"])
+
+    kept, skipped = [], {"too_small": 0, "blurred": 0}
+    for top, right, bottom, left in boxes:
+        top, left = max(0, int(top / scale)), max(0, int(left / scale))
+        bottom, right = min(height, int(round(bottom / scale))), min(width, int(round(right / scale)))
+        if min(bottom - top, right - left) < config["min_face_px"]:
+            skipped["too_small"] += 1
+            continue
+        if config["min_sharpness"] > 0:
+            crop = image[top:bottom, left:right]
+            gray = crop @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+            if sharpness(gray) < config["min_sharpness"]:
+                skipped["blurred"] += 1
+                continue
+        kept.append((top, right, bottom, left))
+    return kept, skipped
+
+
+def detect_and_encode(image: np.ndarray, config: Optional[Dict] = None):
+    """
+    (boxes, encodings, skipped) for an RGB frame: detection on the
+    downscaled copy, landmarks and encodings on the full-resolution crops only.
+    """
+    import face_recognition
+
+    config = config or DEFAULT_DETECTION
+    boxes, skipped = detect_faces(image, config)
+    if not boxes:
+        return [], [], skipped
+    encodings = face_recognition.face_encodings(image, boxes, num_jitters=config["jitters"])
+    return boxes, encodings, skipped
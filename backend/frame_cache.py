@@ -0,0 +1,130 @@
+"""
+Frame Description Cache for Trinetra
+Gemini vision answers keyed by camera, prompt and a perceptual hash of the
+frame, so an unchanged scene is described once per TTL instead of per request
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+import numpy as np
+from PIL import Image
+
+from caching import cache_key
+
+# Hamming distance (of 64 bits) under which two frames count as the same scene; < 0 disables the cache
+DEFAULT_THRESHOLD = int(os.getenv("FRAME_CACHE_THRESHOLD", "4"))
+DEFAULT_TTL = float(os.getenv("FRAME_CACHE_TTL", "300"))
+# Recent distinct scenes remembered per (camera, prompt)
+SCENES_PER_KEY = 8
+# Cameras with their own hit/miss counters; the least recently seen are dropped first
+STATS_CAMERAS = 1024
+
+
+def dhash(image: Image.Image, hash_size: int = 8) -> int:
+    """
+    Difference hash: the frame shrunk to (hash_size + 1) x hash_size grey
+    pixels, one bit per horizontally adjacent pair. Robust to JPEG noise,
+    small exposure changes and rescaling; changes when the scene does.
+    """
+    grey = np.asarray(image.convert("L").resize((hash_size + 1, hash_size), Image.BILINEAR), dtype=np.int16)
+    bits = (grey[:, 1:] > grey[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def check_threshold(value, field: str = "frame_cache_threshold") -> Optional[int]:
+    """A per-camera threshold setting: an integer no greater than 64, or None for the default"""
+    if value is not None and (isinstance(value, bool) or not isinstance(value, int) or value > 64):
+        raise ValueError(f"{field} must be an integer no greater than 64, or null")
+    return value
+
+
+class FrameDescriptionCache:
+    """
+    Thread-safe LRU of (camera, prompt) -> recent (hash, expires_at, description).
+    A lookup hits when an unexpired entry's hash is within the camera's
+    threshold of the new frame's hash. Totals count every lookup; per-camera
+    counters are kept for the stats_cameras most recently seen cameras.
+    """
+
+    def __init__(self, ttl: float = DEFAULT_TTL, threshold: int = DEFAULT_THRESHOLD, maxsize: int = 4096,
+                 stats_cameras: int = STATS_CAMERAS):
+        self.ttl = ttl
+        self.threshold = threshold
+        self.maxsize = maxsize
+        self.stats_cameras = stats_cameras
+        self._data = OrderedDict()  # key -> [(hash, expires_at, description)], newest last
+        self._lock = threading.Lock()
+        self._totals = {"hits": 0, "misses": 0, "bypassed": 0}
+        self._stats = OrderedDict()  # camera -> counts, most recently seen last
+
+    def get(self, camera: str, prompt: str, frame_hash: int, threshold: Optional[int] = None) -> Optional[str]:
+        threshold = self.threshold if threshold is None else threshold
+        key = cache_key(camera, prompt)
+        now = time.time()
+        with self._lock:
+            if threshold < 0:
+                self._count(camera, "bypassed")
+                return None
+            scenes = [scene for scene in self._data.get(key, []) if scene[1] > now]
+            if scenes:
+                self._data[key] = scenes
+                self._data.move_to_end(key)
+            else:
+                self._data.pop(key, None)
+            best = min(scenes, key=lambda scene: hamming(scene[0], frame_hash), default=None)
+            if best is not None and hamming(best[0], frame_hash) <= threshold:
+                self._count(camera, "hits")
+                return best[2]
+            self._count(camera, "misses")
+            return None
+
+    def _count(self, camera: str, outcome: str):
+        """Bump the total and the camera's counter; caller holds the lock"""
+        self._totals[outcome] += 1
+        counts = self._stats.pop(camera, None) or {"hits": 0, "misses": 0, "bypassed": 0}
+        counts[outcome] += 1
+        self._stats[camera] = counts
+        while len(self._stats) > self.stats_cameras:
+            self._stats.popitem(last=False)
+
+    def set(self, camera: str, prompt: str, frame_hash: int, description: str):
+        key = cache_key(camera, prompt)
+        with self._lock:
+            scenes = self._data.setdefault(key, [])
+            scenes.append((frame_hash, time.time() + self.ttl, description))
+            del scenes[:-SCENES_PER_KEY]
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            cameras = {camera: dict(counts) for camera, counts in self._stats.items()}
+            totals = dict(self._totals)
+            entries = sum(len(scenes) for scenes in self._data.values())
+        hits, misses = totals["hits"], totals["misses"]
+        for counts in cameras.values():
+            lookups = counts["hits"] + counts["misses"]
+            counts["hit_ratio"] = counts["hits"] / lookups if lookups else 0.0
+        return {
+            "hits": hits,
+            "misses": misses,
+            "bypassed": totals["bypassed"],
+            "hit_ratio": hits / (hits + misses) if hits + misses else 0.0,
+            "entries": entries,
+            "ttl": self.ttl,
+            "default_threshold": self.threshold,
+            "cameras": cameras
+        }
@@ -0,0 +1,225 @@
+"""
+Geospatial Camera Index for Trinetra
+Uniform lat/lon grid over camera coordinates answering radius and
+k-nearest queries without scanning every camera
+"""
+
+import json
+import math
+import threading
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180.0
+
+
+def parse_location(value) -> Optional[Tuple[float, float]]:
+    """
+    (lat, lon) from any geo_point form Elasticsearch accepts for a camera
+    location: "lat,lon", {"lat": .., "lon": ..} or GeoJSON-ordered [lon, lat].
+    Returns None for anything else (e.g. a place name).
+    """
+    if isinstance(value, str):
+        text = value.strip()
+        if text.startswith(("{", "[")):
+            try:
+                return parse_location(json.loads(text))
+            except ValueError:
+                return None
+        parts = text.split(",")
+        if len(parts) != 2:
+            return None
+        try:
+            lat, lon = float(parts[0]), float(parts[1])
+        except ValueError:
+            return None
+    elif isinstance(value, dict) and "lat" in value and "lon" in value:
+        try:
+            lat, lon = float(value["lat"]), float(value["lon"])
+        except (TypeError, ValueError):
+            return None
+    elif isinstance(value, (list, tuple)) and len(value) == 2:
+        try:
+            lon, lat = float(value[0]), float(value[1])
+        except (TypeError, ValueError):
+            return None
+    else:
+        return None
+
+    if not (-90.0 <= lat <= 90.0 and -180.0 <= lon <= 180.0):
+        return None
+    return lat, lon
+
+
+def haversine_km(lat: float, lon: float, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """Great-circle distance from one point to many, in kilometres"""
+    lat1, lon1 = math.radians(lat), math.radians(lon)
+    lat2, lon2 = np.radians(lats), np.radians(lons)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+# A Python-level cell visit costs roughly as much as this many vectorized
+# distance computations; past that ratio a full scan is cheaper than the grid
+CELL_VISIT_COST = 32
+
+
+class GeoGridIndex:
+    """
+    Cameras bucketed into cell_deg x cell_deg cells.
+
+    Radius queries visit only the cells overlapping the search box; k-nearest
+    queries walk rings of cells outward until no unvisited cell can hold a
+    closer camera. When a query would visit so many cells that a scan is
+    cheaper (sparse data, polar regions, huge radii) it falls back to one
+    vectorized distance pass over the dense coordinate array.
+    """
+
+    def __init__(self, cell_deg: float = 0.25):
+        self.cell_deg = cell_deg
+        self._cols = int(round(360.0 / cell_deg))
+        self._rows = int(round(180.0 / cell_deg))
+        self._cells: Dict[Tuple[int, int], Set[str]] = {}
+        # Dense (lat, lon) rows; removal moves the last row into the gap
+        self._ids: List[str] = []
+        self._slots: Dict[str, int] = {}
+        self._coords = np.zeros((64, 2), dtype=np.float64)
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._ids)
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        ix = int((lon + 180.0) // self.cell_deg) % self._cols
+        iy = min(int((lat + 90.0) // self.cell_deg), self._rows - 1)
+        return ix, iy
+
+    def add(self, cam_id: str, lat: float, lon: float):
+        with self._lock:
+            self.remove(cam_id)
+            slot = len(self._ids)
+            if slot == len(self._coords):
+                grown = np.zeros((2 * slot, 2), dtype=np.float64)
+                grown[:slot] = self._coords
+                self._coords = grown
+            self._coords[slot] = (lat, lon)
+            self._ids.append(cam_id)
+            self._slots[cam_id] = slot
+            self._cells.setdefault(self._cell(lat, lon), set()).add(cam_id)
+
+    def remove(self, cam_id: str):
+        with self._lock:
+            slot = self._slots.pop(cam_id, None)
+            if slot is None:
+                return
+            cell = self._cell(*self._coords[slot])
+            members = self._cells.get(cell)
+            if members is not None:
+                members.discard(cam_id)
+                if not members:
+                    del self._cells[cell]
+
+            last = len(self._ids) - 1
+            if slot != last:
+                moved = self._ids[last]
+                self._coords[slot] = self._coords[last]
+                self._ids[slot] = moved
+                self._slots[moved] = slot
+            self._ids.pop()
+
+    def _distances(self, lat: float, lon: float, ids: List[str]) -> np.ndarray:
+        coords = self._coords[[self._slots[cam_id] for cam_id in ids]].reshape(-1, 2)
+        return haversine_km(lat, lon, coords[:, 0], coords[:, 1])
+
+    def _scan(self, lat: float, lon: float) -> Tuple[List[str], np.ndarray]:
+        coords = self._coords[:len(self._ids)]
+        return list(self._ids), haversine_km(lat, lon, coords[:, 0], coords[:, 1])
+
+    def _ring(self, cx: int, cy: int, r: int):
+        if r == 0:
+            yield cx, cy
+            return
+        for dx in range(-r, r + 1):
+            yield cx + dx, cy - r
+            yield cx + dx, cy + r
+        for dy in range(-r + 1, r):
+            yield cx - r, cy + dy
+            yield cx + r, cy + dy
+
+    def within(self, lat: float, lon: float, radius_km: float) -> List[Tuple[str, float]]:
+        """Cameras within radius_km, nearest first"""
+        with self._lock:
+            if not self._ids or radius_km < 0:
+                return []
+
+            dlat = radius_km / KM_PER_DEGREE
+            lat_lo, lat_hi = max(-90.0, lat - dlat), min(90.0, lat + dlat)
+            widest = math.cos(math.radians(max(abs(lat_lo), abs(lat_hi))))
+            dlon = 360.0 if widest < 1e-9 else min(360.0, dlat / widest)
+
+            y_lo, y_hi = self._cell(lat_lo, 0.0)[1], self._cell(lat_hi, 0.0)[1]
+            x_span = min(self._cols, int(math.ceil(2 * dlon / self.cell_deg)) + 2)
+            if (y_hi - y_lo + 1) * x_span * CELL_VISIT_COST > len(self._ids):
+                ids, distances = self._scan(lat, lon)
+            else:
+                x_start = int((lon - dlon + 180.0) // self.cell_deg)
+                xs = {(x_start + step) % self._cols for step in range(x_span)}
+                ids = [
+                    cam_id
+                    for iy in range(y_lo, y_hi + 1)
+                    for ix in xs
+                    for cam_id in self._cells.get((ix, iy), ())
+                ]
+                if not ids:
+                    return []
+                distances = self._distances(lat, lon, ids)
+
+            inside = np.flatnonzero(distances <= radius_km)
+            inside = inside[np.argsort(distances[inside], kind="stable")]
+            return [(ids[i], float(distances[i])) for i in inside]
+
+    def nearest(self, lat: float, lon: float, k: int, radius_km: Optional[float] = None) -> List[Tuple[str, float]]:
+        """The k cameras closest to (lat, lon), optionally limited to radius_km"""
+        if radius_km is not None:
+            return self.within(lat, lon, radius_km)[:k]
+
+        with self._lock:
+            total = len(self._ids)
+            if total == 0 or k <= 0:
+                return []
+
+            cx, cy = self._cell(lat, lon)
+            seen_cells = set()
+            ids: List[str] = []
+            chunks: List[np.ndarray] = []
+            r = 0
+            while True:
+                found = []
+                for ix, iy in self._ring(cx, cy, r):
+                    cell = (ix % self._cols, iy)
+                    if 0 <= iy < self._rows and cell not in seen_cells:
+                        seen_cells.add(cell)
+                        found.extend(self._cells.get(cell, ()))
+
+                if len(seen_cells) * CELL_VISIT_COST > total:
+                    ids, distances = self._scan(lat, lon)
+                    break
+                if found:
+                    ids.extend(found)
+                    chunks.append(self._distances(lat, lon, found))
+                if len(ids) >= k:
+                    distances = np.concatenate(chunks)
+                    if len(ids) == total:
+                        break
+                    kth = np.partition(distances, k - 1)[k - 1]
+                    # Unvisited cells are at least r cells away along some axis
+                    polar = math.cos(math.radians(min(90.0, abs(lat) + (r + 1) * self.cell_deg)))
+                    if kth <= r * self.cell_deg * KM_PER_DEGREE * polar:
+                        break
+                r += 1
+
+            top = np.argpartition(distances, k - 1)[:k] if k < len(ids) else np.arange(len(ids))
+            top = top[np.argsort(distances[top], kind="stable")]
+            return [(ids[i], float(distances[i])) for i in top]
@@ -0,0 +1,77 @@
+"""
+Image I/O for Trinetra
+Camera frames fetched into memory and decoded once; the same decoded frame
+feeds face_recognition (RGB array) and Gemini vision (PIL image)
+"""
+
+import io
+import threading
+from typing import Optional
+
+import numpy as np
+import requests
+from PIL import Image
+
+from singleflight import inflight
+
+DOWNLOAD_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+}
+DOWNLOAD_TIMEOUT = 30
+
+_session = requests.Session()
+_session.headers.update(DOWNLOAD_HEADERS)
+
+
+def fetch_image_bytes(image_url: str) -> bytes:
+    """Downloads an image into memory; raises requests.RequestException on failure"""
+    response = _session.get(image_url, timeout=DOWNLOAD_TIMEOUT, allow_redirects=True)
+    response.raise_for_status()
+    return response.content
+
+
+def decode_image(data: bytes) -> Image.Image:
+    """Decode image bytes to an RGB PIL image, the way face_recognition.load_image_file does"""
+    image = Image.open(io.BytesIO(data))
+    return image.convert("RGB") if image.mode != "RGB" else image
+
+
+class Frame:
+    """
+    One downloaded image. Bytes are decoded on first use and at most once;
+    .array is built from that decode and cached, so face detection and the
+    vision model never decode or copy the image separately. Safe to share
+    between threads (concurrent fetches of one URL get the same Frame).
+    """
+
+    def __init__(self, data: bytes, source: Optional[str] = None):
+        self.data = data
+        self.source = source
+        self._image: Optional[Image.Image] = None
+        self._array: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+
+    @property
+    def image(self) -> Image.Image:
+        if self._image is None:
+            with self._lock:
+                if self._image is None:
+                    image = decode_image(self.data)
+                    image.load()
+                    self._image = image
+        return self._image
+
+    @property
+    def array(self) -> np.ndarray:
+        """H x W x 3 uint8 RGB, shared by every consumer; treat as read-only"""
+        if self._array is None:
+            image = self.image
+            with self._lock:
+                if self._array is None:
+                    self._array = np.array(image)
+        return self._array
+
+
+def fetch_frame(image_url: str) -> Frame:
+    """Downloads and wraps a frame; concurrent requests for the same URL share one download"""
+    return inflight.do("frame", image_url, lambda: Frame(fetch_image_bytes(image_url), source=image_url))
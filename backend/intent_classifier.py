@@ -0,0 +1,297 @@
+"""
+Intent Classifier for Trinetra
+Local fast path for /api/query_determine: keyword and regex rules decide the
+location index and face_search flag in microseconds, an optional centroid
+model over cached prompt embeddings settles what the rules cannot, and only
+the remaining low-confidence prompts go to Gemini
+"""
+
+import json
+import os
+import random
+import re
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+# index -> display name and the words that mean it; override with INTENT_LOCATIONS_FILE
+DEFAULT_LOCATIONS = {
+    382732: {"name": "Denver", "aliases": ["denver", "ethdenver", "eth denver"]},
+    1: {"name": "Austin", "aliases": ["austin"]},
+}
+
+# Someone to identify vs. an object or scene to find
+FACE_PATTERNS = [
+    r"\bfaces?\b", r"\bwho\b", r"\bidentify\b", r"\brecogni[sz]e\b", r"\bperson\b", r"\bsomeone\b",
+    r"\bsomebody\b", r"\bsuspects?\b", r"\b(?:man|men|woman|women|guy|girl|boy|lady|kid)\b",
+    r"\b(?:he|she|him|her)\b", r"\bindividual\b", r"\bintruder\b", r"\bthief\b", r"\bwearing\b",
+]
+OBJECT_PATTERNS = [
+    r"\b(?:cars?|vehicles?|trucks?|vans?|bikes?|bicycles?|motorcycles?|buses|bus)\b", r"\blicen[cs]e plate\b",
+    r"\b(?:packages?|parcels?|bags?|luggage)\b", r"\b(?:fire|smoke|flood(?:ing)?|weather|rain|snow)\b",
+    r"\b(?:traffic|parking|crowds?|people)\b", r"\b(?:dogs?|cats?|animals?)\b",
+    r"\b(?:dry|wet|open|closed|empty|busy)\b", r"\b(?:court|street|road|lot|building|door|gate)\b",
+]
+
+CONFIDENCE_THRESHOLD = float(os.getenv("INTENT_CONFIDENCE_THRESHOLD", "0.8"))
+# Share of fast-path answers also sent to Gemini in the background to measure agreement
+SHADOW_RATE = float(os.getenv("INTENT_SHADOW_RATE", "0.05"))
+# Centroid model: examples needed per class and the cosine margin it must clear
+MIN_EXAMPLES = 5
+MIN_MARGIN = 0.02
+
+LLM_TEMPLATE = (
+    "Return in valid JSON only. First, examine the following user query and determine if it states/matches any of the following locations: {locations}. If it is, please return the index of the place in the json response in ‘location’ if no location exists, return -1. Finally, check if this requires a 'face_search' , return True of False. This query should be checking if the user is asking to get details on a face or not. Here is an example query “Find me the person who is on stage in ethDenver now” —> return JSON: {{“location”:382732, “face_search”:true}} explanation: we need 382732th location(denver) and we need face search to get the person. here is another example:  “Find me the person in orange jumpsuit escaping prison” —> return JSON: {{“location”:-1, “face_search”:true}}. Explanation: we cant search by location bc we dont know and it doesnt match the location searches,. we need face_search to get the face details. “Find the stolen red car” —> return JSON: {{“location”:-1, “face_search”:false}}. Explanation: we cant search by location bc we dont know and it doesnt match the location searches,. we cant use face_search because we arent searching for a specific face. thanks! USER QUERY:"
+)
+
+
+def load_locations(path: Optional[str] = None) -> Dict[int, Dict]:
+    """
+    Location table from a JSON file shaped like DEFAULT_LOCATIONS
+    ({"382732": {"name": "Denver", "aliases": ["denver"]}}), or the defaults.
+    """
+    if not path:
+        return DEFAULT_LOCATIONS
+    with open(path, "r", encoding="utf-8") as f:
+        table = json.load(f)
+    return {
+        int(index): {
+            "name": entry["name"],
+            "aliases": [alias.lower() for alias in entry.get("aliases") or [entry["name"]]]
+        }
+        for index, entry in table.items()
+    }
+
+
+def parse_llm_intent(result) -> Optional[Dict]:
+    """{"location": int, "face_search": bool} from a GPT_Call result, None if it is not one"""
+    if not isinstance(result, dict) or "location" not in result or "face_search" not in result:
+        return None
+    try:
+        location = int(result["location"])
+    except (TypeError, ValueError):
+        return None
+    face_search = result["face_search"]
+    if isinstance(face_search, str):
+        face_search = face_search.strip().lower() == "true"
+    return {"location": location, "face_search": bool(face_search)}
+
+
+class CentroidModel:
+    """face_search from the nearest of two centroids of unit-normalized prompt embeddings"""
+
+    def __init__(self):
+        self._sums = {True: None, False: None}
+        self._counts = {True: 0, False: 0}
+        self._lock = threading.Lock()
+
+    def learn(self, embedding, face_search: bool):
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if not norm:
+            return
+        with self._lock:
+            total = self._sums[face_search]
+            self._sums[face_search] = vector / norm if total is None else total + vector / norm
+            self._counts[face_search] += 1
+
+    @property
+    def ready(self) -> bool:
+        return min(self._counts.values()) >= MIN_EXAMPLES
+
+    def predict(self, embedding):
+        """(face_search, margin) or None while either class has too few examples"""
+        if not self.ready:
+            return None
+        vector = np.asarray(embedding, dtype=np.float32)
+        vector = vector / (np.linalg.norm(vector) or 1.0)
+        with self._lock:
+            scores = {label: float(vector @ (total / np.linalg.norm(total))) for label, total in self._sums.items()}
+        label = scores[True] > scores[False]
+        return label, abs(scores[True] - scores[False])
+
+    def stats(self) -> Dict:
+        return {"ready": self.ready, "examples": {str(label).lower(): count for label, count in self._counts.items()}}
+
+
+class IntentClassifier:
+    """
+    classify() returns {"location", "face_search", "confidence", "source"}.
+    The caller answers from it when confidence >= threshold and otherwise
+    asks Gemini with llm_prompt(), then hands the answer to learn() so it
+    trains the centroid model and is appended to the replay log. A
+    shadow_rate sample of fast-path answers is checked against Gemini too
+    (record_shadow), so the log also covers prompts the fast path answers.
+    """
+
+    def __init__(self, locations: Optional[Dict[int, Dict]] = None, threshold: float = CONFIDENCE_THRESHOLD,
+                 embed: Optional[Callable[[str], List[float]]] = None, replay_path: Optional[str] = None,
+                 shadow_rate: float = SHADOW_RATE):
+        self.locations = locations or DEFAULT_LOCATIONS
+        self.threshold = threshold
+        self.shadow_rate = shadow_rate
+        self.embed = embed
+        self.replay_path = replay_path
+        self.model = CentroidModel()
+        self._location_patterns = [
+            (index, re.compile("|".join(r"\b" + re.escape(alias.lower()) + r"\b" for alias in entry["aliases"])))
+            for index, entry in self.locations.items()
+        ]
+        self._face = re.compile("|".join(FACE_PATTERNS))
+        self._object = re.compile("|".join(OBJECT_PATTERNS))
+        self._lock = threading.Lock()
+        self._counts = {"rules": 0, "embedding": 0, "llm": 0}
+        self._shadow = {"checked": 0, "agreed": 0, "location_agreed": 0, "face_agreed": 0}
+        self._classify_seconds = 0.0
+
+    def llm_prompt(self, prompt: str) -> str:
+        locations = ", ".join(f"{index}:{entry['name']}" for index, entry in self.locations.items())
+        return LLM_TEMPLATE.format(locations="{" + locations + "}") + prompt
+
+    def rules(self, prompt: str) -> Dict:
+        """Rule-only answer; confidence is the weaker of the two decisions"""
+        text = prompt.lower()
+        matched = [index for index, pattern in self._location_patterns if pattern.search(text)]
+        if len(matched) == 1:
+            location, location_confidence = matched[0], 0.95
+        elif not matched:
+            location, location_confidence = -1, 0.9
+        else:
+            location, location_confidence = matched[0], 0.3  # names more than one known place
+
+        face_hits = len(self._face.findall(text))
+        object_hits = len(self._object.findall(text))
+        if face_hits and not object_hits:
+            face_search, face_confidence = True, 0.9
+        elif object_hits and not face_hits:
+            face_search, face_confidence = False, 0.9
+        elif face_hits and object_hits:
+            # "the man next to the red car": lean to the side with more hits, but not confidently
+            face_search, face_confidence = face_hits >= object_hits, 0.6
+        else:
+            face_search, face_confidence = False, 0.7
+
+        return {
+            "location": location,
+            "face_search": face_search,
+            "confidence": min(location_confidence, face_confidence),
+            "face_confidence": face_confidence,
+            "location_confidence": location_confidence,
+            "source": "rules"
+        }
+
+    def classify(self, prompt: str) -> Dict:
+        started = time.perf_counter()
+        intent = self.rules(prompt)
+        rule_time = time.perf_counter() - started
+
+        # Only face_search can be rescued by the embedding model; unclear locations need the LLM
+        if (intent["confidence"] < self.threshold and intent["location_confidence"] >= self.threshold
+                and self.embed is not None and self.model.ready):
+            try:
+                predicted = self.model.predict(self.embed(prompt))
+            except Exception as e:
+                print(f"⚠️ Intent embedding failed: {e}")
+                predicted = None
+            if predicted is not None and predicted[1] >= MIN_MARGIN:
+                intent.update(face_search=predicted[0], confidence=self.threshold, source="embedding")
+
+        with self._lock:
+            self._classify_seconds += rule_time
+            self._counts[intent["source"] if intent["confidence"] >= self.threshold else "llm"] += 1
+        return intent
+
+    def confident(self, intent: Dict) -> bool:
+        return intent["confidence"] >= self.threshold
+
+    def sample_shadow(self) -> bool:
+        """Whether this fast-path answer should also be checked against Gemini"""
+        return self.shadow_rate > 0 and random.random() < self.shadow_rate
+
+    def record_shadow(self, prompt: str, intent: Dict, llm_intent: Dict):
+        """Count agreement between a fast-path answer and Gemini's, then learn and log it"""
+        location_agreed = intent["location"] == llm_intent["location"]
+        face_agreed = intent["face_search"] == llm_intent["face_search"]
+        with self._lock:
+            self._shadow["checked"] += 1
+            self._shadow["agreed"] += location_agreed and face_agreed
+            self._shadow["location_agreed"] += location_agreed
+            self._shadow["face_agreed"] += face_agreed
+        self.learn(prompt, llm_intent, source="shadow",
+                   fast_path={"location": intent["location"], "face_search": intent["face_search"]})
+
+    def learn(self, prompt: str, llm_intent: Dict, record: bool = True, source: str = "fallback",
+              fast_path: Optional[Dict] = None):
+        """
+        Train on an LLM answer and append it to the replay log. source is
+        "fallback" (the rules were unsure) or "shadow" (a sampled fast-path
+        answer, logged with what the fast path said).
+        """
+        if self.embed is not None:
+            try:
+                self.model.learn(self.embed(prompt), llm_intent["face_search"])
+            except Exception as e:
+                print(f"⚠️ Intent embedding failed: {e}")
+        if record and self.replay_path:
+            entry = {"prompt": prompt, **llm_intent, "source": source, "recorded_at": time.time()}
+            if fast_path is not None:
+                entry["fast_path"] = fast_path
+            line = json.dumps(entry)
+            with self._lock:
+                os.makedirs(os.path.dirname(self.replay_path) or ".", exist_ok=True)
+                with open(self.replay_path, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+
+    def train_from_replay(self, path: Optional[str] = None) -> int:
+        """Fit the centroid model on a replay log (embeddings come from embed, normally cached)"""
+        path = path or self.replay_path
+        if self.embed is None or not path or not os.path.exists(path):
+            return 0
+        learned = 0
+        for record in read_replay(path):
+            self.learn(record["prompt"], record, record=False)
+            learned += 1
+        print(f"✅ Intent model trained on {learned} replayed prompts")
+        return learned
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counts = dict(self._counts)
+            shadow = dict(self._shadow)
+            classify_seconds = self._classify_seconds
+        total = sum(counts.values())
+        fast = counts["rules"] + counts["embedding"]
+        return {
+            "classified": total,
+            "fast_path": fast,
+            "rules": counts["rules"],
+            "embedding": counts["embedding"],
+            "llm_fallback": counts["llm"],
+            "fast_path_ratio": fast / total if total else 0.0,
+            "avg_rule_microseconds": round(classify_seconds / total * 1e6, 1) if total else None,
+            "shadow": {
+                "rate": self.shadow_rate,
+                **shadow,
+                "agreement": shadow["agreed"] / shadow["checked"] if shadow["checked"] else None
+            },
+            "threshold": self.threshold,
+            "locations": {index: entry["name"] for index, entry in self.locations.items()},
+            "embedding_model": self.model.stats() if self.embed is not None else None
+        }
+
+
+def read_replay(path: str) -> List[Dict]:
+    """LLM-labelled prompts from a replay log, skipping malformed lines"""
+    records = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            intent = parse_llm_intent(record)
+            if intent and isinstance(record.get("prompt"), str):
+                records.append({"prompt": record["prompt"], **intent, "source": record.get("source", "fallback")})
+    return records
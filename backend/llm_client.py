@@ -0,0 +1,296 @@
+"""
+LLM Client for Trinetra
+One Gemini client shared by every call site: token-bucket rate limiting,
+bounded concurrency, retries with jittered backoff, per-call deadlines and
+latency/error metrics per call site
+"""
+
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+import google.generativeai as genai
+from google.api_core import exceptions as api_exceptions
+
+from caching import cache_key
+from singleflight import inflight
+
+TEXT_MODEL = os.getenv("GEMINI_TEXT_MODEL", "gemini-pro")
+VISION_MODEL = os.getenv("GEMINI_VISION_MODEL", "gemini-1.5-flash")
+
+# Errors worth another attempt: quota, overload and transient server failures
+RETRYABLE_ERRORS = (
+    api_exceptions.ResourceExhausted,
+    api_exceptions.TooManyRequests,
+    api_exceptions.ServiceUnavailable,
+    api_exceptions.InternalServerError,
+    api_exceptions.DeadlineExceeded,
+    ConnectionError,
+)
+LATENCY_SAMPLES = 512  # recent calls kept per call site for percentiles
+
+
+class LLMTimeout(TimeoutError):
+    """The call's deadline passed while waiting for quota, a slot, a retry or the response"""
+
+
+class TokenBucket:
+    """`rate` tokens per second up to `capacity`; acquire() blocks until one is free or the deadline passes"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, deadline: float) -> bool:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class CallSiteMetrics:
+    """Counters and recent latencies for one call site"""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.timeouts = 0
+        self.rate_limited = 0
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.first_chunk = deque(maxlen=LATENCY_SAMPLES)  # streamed calls only
+
+    def as_dict(self) -> Dict:
+        latencies = sorted(self.latencies)
+        first_chunk = sorted(self.first_chunk)
+
+        def percentile(p, samples=latencies):
+            return round(samples[min(len(samples) - 1, int(p * len(samples)))] * 1000, 1) if samples else None
+
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "retries": self.retries,
+            "timeouts": self.timeouts,
+            "rate_limited": self.rate_limited,
+            "error_rate": self.errors / self.calls if self.calls else 0.0,
+            "p50_ms": percentile(0.5),
+            "p95_ms": percentile(0.95),
+            "max_ms": round(latencies[-1] * 1000, 1) if latencies else None,
+            "first_chunk_p50_ms": percentile(0.5, first_chunk),
+            "first_chunk_p95_ms": percentile(0.95, first_chunk)
+        }
+
+
+class LLMClient:
+    """
+    Gemini access for the whole backend. Every call names its call site
+    (e.g. "gpt_call", "agent.decompose") for metrics, takes a token from the
+    shared bucket, holds one of max_concurrency slots while the request is in
+    flight, and is retried on quota/transient errors with full-jitter backoff.
+    Nothing waits past the call's deadline; LLMTimeout is raised instead.
+    Identical text prompts and embeddings already in flight are joined
+    rather than sent again (see singleflight).
+    """
+
+    def __init__(self, rate: float = 5.0, burst: float = 10.0, max_concurrency: int = 8,
+                 max_retries: int = 3, deadline: float = 30.0,
+                 backoff_base: float = 0.5, backoff_cap: float = 8.0):
+        self.bucket = TokenBucket(rate, burst)
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.deadline = deadline
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._models = {}
+        self._metrics: Dict[str, CallSiteMetrics] = {}
+        self._lock = threading.Lock()
+        self._configured_key = None
+
+    @property
+    def configured(self) -> bool:
+        return bool(os.getenv("GOOGLE_API_KEY"))
+
+    def _configure(self):
+        api_key = os.getenv("GOOGLE_API_KEY")
+        if api_key != self._configured_key:
+            with self._lock:
+                if api_key != self._configured_key:
+                    genai.configure(api_key=api_key)
+                    self._configured_key = api_key
+                    self._models.clear()
+
+    def model(self, name: str):
+        """One GenerativeModel per model name, reused across calls and threads"""
+        self._configure()
+        with self._lock:
+            if name not in self._models:
+                self._models[name] = genai.GenerativeModel(name)
+            return self._models[name]
+
+    def generate(self, site: str, contents: Any, model: str = TEXT_MODEL, deadline: Optional[float] = None) -> str:
+        """Response text for generate_content(contents) on `model`"""
+        def call():
+            return self._call(site, deadline, lambda timeout: self.model(model).generate_content(
+                contents, request_options={"timeout": timeout}
+            ).text)
+
+        if isinstance(contents, str):
+            return inflight.do("text", cache_key(model, contents), call)
+        return call()
+
+    def embed(self, site: str, deadline: Optional[float] = None, **kwargs) -> Dict:
+        """genai.embed_content(**kwargs) under the same quota and metrics"""
+        self._configure()
+
+        def call():
+            return self._call(site, deadline, lambda timeout: genai.embed_content(
+                request_options={"timeout": timeout}, **kwargs
+            ))
+
+        if isinstance(kwargs.get("content"), str):
+            return inflight.do("embedding", cache_key(kwargs.get("model"), kwargs.get("task_type"),
+                                                      kwargs["content"]), call)
+        return call()
+
+    def stream(self, site: str, contents: Any, model: str = TEXT_MODEL,
+               deadline: Optional[float] = None) -> Iterator[str]:
+        """
+        Response text chunks as Gemini produces them. The concurrency slot is
+        held until the stream ends, and failures are retried only before the
+        first chunk; a stream is never coalesced with other callers.
+        """
+        metrics = self._site(site)
+        with self._measured(metrics) as started:
+            expires = started + (self.deadline if deadline is None else deadline)
+            for attempt in range(self.max_retries + 1):
+                self._acquire(site, expires)
+                streaming = False
+                try:
+                    response = self.model(model).generate_content(
+                        contents, stream=True,
+                        request_options={"timeout": max(0.1, expires - time.monotonic())}
+                    )
+                    for chunk in response:
+                        text = chunk.text
+                        if not text:
+                            continue
+                        if not streaming:
+                            streaming = True
+                            with self._lock:
+                                metrics.first_chunk.append(time.monotonic() - started)
+                        yield text
+                    return
+                except RETRYABLE_ERRORS as e:
+                    if streaming:
+                        raise
+                    delay = self._retry_delay(site, metrics, attempt, expires, e)
+                finally:
+                    self._slots.release()
+                time.sleep(delay)
+
+    def _call(self, site: str, deadline: Optional[float], request):
+        metrics = self._site(site)
+        with self._measured(metrics) as started:
+            expires = started + (self.deadline if deadline is None else deadline)
+            for attempt in range(self.max_retries + 1):
+                self._acquire(site, expires)
+                try:
+                    return request(max(0.1, expires - time.monotonic()))
+                except RETRYABLE_ERRORS as e:
+                    delay = self._retry_delay(site, metrics, attempt, expires, e)
+                finally:
+                    self._slots.release()
+                time.sleep(delay)
+
+    def _acquire(self, site: str, expires: float):
+        """A rate-limit token and a concurrency slot (released by the caller), or LLMTimeout"""
+        if not self.bucket.acquire(expires):
+            raise LLMTimeout(f"{site}: no rate-limit token before the deadline")
+        if not self._slots.acquire(timeout=max(0.0, expires - time.monotonic())):
+            raise LLMTimeout(f"{site}: no free LLM slot before the deadline")
+
+    def _retry_delay(self, site: str, metrics: CallSiteMetrics, attempt: int, expires: float, error: Exception) -> float:
+        """
+        Full-jitter backoff before the next attempt. Out of time (or the last
+        attempt hit the request timeout) raises LLMTimeout from error; out of
+        attempts re-raises error.
+        """
+        with self._lock:
+            if isinstance(error, (api_exceptions.ResourceExhausted, api_exceptions.TooManyRequests)):
+                metrics.rate_limited += 1
+        delay = random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+        timed_out = isinstance(error, api_exceptions.DeadlineExceeded) and attempt == self.max_retries
+        if timed_out or time.monotonic() + delay >= expires:
+            raise LLMTimeout(f"{site}: deadline passed after {attempt + 1} attempt(s): {error}") from error
+        if attempt == self.max_retries:
+            raise error
+        print(f"⚠️ {site}: {type(error).__name__}, retrying in {delay:.2f}s")
+        with self._lock:
+            metrics.retries += 1
+        return delay
+
+    @contextmanager
+    def _measured(self, metrics: CallSiteMetrics):
+        """Counts the call and its failures and records its latency; yields the start time"""
+        started = time.monotonic()
+        with self._lock:
+            metrics.calls += 1
+        try:
+            yield started
+        except LLMTimeout:
+            with self._lock:
+                metrics.timeouts += 1
+                metrics.errors += 1
+            raise
+        except Exception:
+            with self._lock:
+                metrics.errors += 1
+            raise
+        finally:
+            with self._lock:
+                metrics.latencies.append(time.monotonic() - started)
+
+    def _site(self, site: str) -> CallSiteMetrics:
+        with self._lock:
+            if site not in self._metrics:
+                self._metrics[site] = CallSiteMetrics()
+            return self._metrics[site]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            sites = {site: metrics.as_dict() for site, metrics in self._metrics.items()}
+        return {
+            "rate_per_second": self.bucket.rate,
+            "burst": self.bucket.capacity,
+            "max_concurrency": self.max_concurrency,
+            "max_retries": self.max_retries,
+            "deadline_seconds": self.deadline,
+            "call_sites": sites
+        }
+
+
+# Singleton instance
+llm_client = LLMClient(
+    rate=float(os.getenv("LLM_RATE_PER_SECOND", "5")),
+    burst=float(os.getenv("LLM_BURST", "10")),
+    max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "8")),
+    max_retries=int(os.getenv("LLM_MAX_RETRIES", "3")),
+    deadline=float(os.getenv("LLM_DEADLINE_SECONDS", "30"))
+)
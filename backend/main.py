@@ -1,23 +1,36 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 from flask_socketio import SocketIO, emit
 import requests
 import base64
+import hashlib
 import os
-import face_recognition
 from PIL import Image
 from supabase import create_client, Client
-import google.generativeai as genai
 import json
 import time
 from dotenv import load_dotenv
 from urllib.parse import urljoin, urlparse
 from bs4 import BeautifulSoup
 import re
+import secrets
+import threading
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
 from sui_integration import sui_blockchain, walrus_storage
 from trinetra_agent import trinetra_agent
 from fitch_marketplace import fitch_marketplace
 from elasticsearch_integration import get_elasticsearch_manager
+from camera_store import CameraStore
+from chroma_import import forget_pending, import_chroma
+from caching import EmbeddingCache, LLMResponseCache, LRUCache, cache_key
+from face_gallery import DEFAULT_TOLERANCE, FaceGallery, detect_faces_bytes, encode_face_bytes
+from face_pipeline import detect_and_encode, detection_config
+from image_io import fetch_frame, fetch_image_bytes
+from frame_cache import FrameDescriptionCache, check_threshold, dhash
+from llm_client import TEXT_MODEL, VISION_MODEL, LLMTimeout, llm_client
+from singleflight import inflight
+from intent_classifier import IntentClassifier, load_locations, parse_llm_intent
 
 KNOWN_FACES_DIR = "known_faces"
 
@@ -27,102 +40,173 @@ CORS(app)  # Enable CORS for all routes
 socketio = SocketIO(app, cors_allowed_origins="*")  # WebSocket support
 load_dotenv()
 
-# Configure Gemini API
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-genai.configure(api_key=GOOGLE_API_KEY)
-
-# Initialize Gemini model for text generation
-gemini_model = genai.GenerativeModel('gemini-pro')
-# For vision tasks
-gemini_vision_model = genai.GenerativeModel('gemini-1.5-flash')
+# Gemini text and vision calls all go through llm_client (rate limit, concurrency cap, retries, deadlines)
 
 #supabase
 SUPABASE_URL = os.getenv("MY_SUPABASE_URL")
 SUPABASE_ANON_KEY = os.getenv("MY_SUPABASE_ANON_KEY")
 supabase: Client = create_client(SUPABASE_URL, SUPABASE_ANON_KEY)
 
-# Simple in-memory camera storage (chromadb has compatibility issues with Python 3.14)
-class SimpleCameraCollection:
-    def __init__(self):
-        self.cameras = {}
-    
-    def add(self, ids, documents, metadatas, embeddings):
-        for i, cam_id in enumerate(ids):
-            self.cameras[cam_id] = {
-                'document': documents[i] if i < len(documents) else '',
-                'metadata': metadatas[i] if i < len(metadatas) else {},
-                'embedding': embeddings[i] if i < len(embeddings) else []
-            }
-    
-    def get(self, ids=None, include=None):
-        if ids:
-            result_ids = []
-            result_metadatas = []
-            for cam_id in ids:
-                if cam_id in self.cameras:
-                    result_ids.append(cam_id)
-                    result_metadatas.append(self.cameras[cam_id]['metadata'])
-            return {'ids': result_ids, 'metadatas': result_metadatas}
-        else:
-            return {
-                'ids': list(self.cameras.keys()),
-                'metadatas': [cam['metadata'] for cam in self.cameras.values()],
-                'documents': [cam['document'] for cam in self.cameras.values()]
-            }
-    
-    def query(self, query_embeddings, n_results=1):
-        # Simple implementation - just return first n cameras
-        cam_ids = list(self.cameras.keys())[:n_results]
-        return {
-            'ids': [cam_ids],
-            'metadatas': [[self.cameras[cid]['metadata'] for cid in cam_ids]]
-        }
-    
-    def delete(self, ids):
-        for cam_id in ids:
-            if cam_id in self.cameras:
-                del self.cameras[cam_id]
-
-camera_collection = SimpleCameraCollection()
+# Persistent camera registry (chromadb has compatibility issues with Python 3.14)
+CAMERA_STORE_DIR = os.getenv("CAMERA_STORE_DIR", os.path.join("data", "cameras"))
+LEGACY_CHROMA_DIR = "chroma"
+# "int8" scans compressed codes and re-ranks a shortlist in full precision
+CAMERA_STORE_QUANTIZATION = os.getenv("CAMERA_STORE_QUANTIZATION") or None
+camera_collection = CameraStore(CAMERA_STORE_DIR, quantization=CAMERA_STORE_QUANTIZATION)
+
+# Caches for model calls, shared across requests and restarts
+CACHE_DIR = os.getenv("CACHE_DIR", os.path.join("data", "cache"))
+EMBEDDING_MODEL = "models/text-embedding-004"
+EMBEDDING_BATCH_SIZE = 100  # embed_content limit per request
+embedding_cache = EmbeddingCache(
+    maxsize=int(os.getenv("EMBEDDING_CACHE_SIZE", "10000")),
+    disk_path=os.path.join(CACHE_DIR, "embeddings.sqlite3"),
+    disk_max_entries=int(os.getenv("EMBEDDING_DISK_CACHE_SIZE", "200000"))
+)
+# Serialized camera listings, keyed by ETag (collection version + request params)
+response_cache = LRUCache(maxsize=int(os.getenv("RESPONSE_CACHE_SIZE", "256")))
+# Parsed JSON from GPT_Call (query_determine and friends), keyed by model and normalized prompt
+llm_response_cache = LLMResponseCache(
+    maxsize=int(os.getenv("LLM_RESPONSE_CACHE_SIZE", "2048")),
+    ttl=float(os.getenv("LLM_RESPONSE_CACHE_TTL", "3600")),
+    disk_path=os.path.join(CACHE_DIR, "llm_responses.sqlite3"),
+    disk_max_entries=int(os.getenv("LLM_RESPONSE_DISK_CACHE_SIZE", "50000"))
+)
+# Gemini vision answers per camera and prompt, reused while the frame's perceptual hash is unchanged
+frame_description_cache = FrameDescriptionCache()
 
 # Initialize Elasticsearch manager
 es_manager = get_elasticsearch_manager()
 
 
-def getImage_Description(image_url):
-    try:
-        # Step 1: Download the image
-        response = requests.get(image_url, stream=True)
+def frame_cache_threshold(camera):
+    """The camera's "frame_cache_threshold" metadata, None (the default) for unknown cameras"""
+    metadatas = camera_collection.get(ids=[camera])['metadatas'] if camera else []
+    threshold = (metadatas or [{}])[0].get('frame_cache_threshold')
+    return None if threshold is None else int(threshold)
 
-        if response.status_code != 200:
-            return f"Failed to download image, status code: {response.status_code}"
 
-        # Step 2: Save image temporarily
-        img_data = response.content
-        temp_image_path = "temp_image.jpg"
-        with open(temp_image_path, "wb") as f:
-            f.write(img_data)
+# Socket.IO push targets are named by a token the server hands each socket in
+# 'connection_response', never by a raw sid from the HTTP body, so a caller
+# can only stream to its own socket. token -> sid, dropped on disconnect.
+_stream_tokens = {}
+_stream_tokens_lock = threading.Lock()
 
-        # Step 3: Use Gemini Vision API for analysis
-        from PIL import Image as PILImage
-        img = PILImage.open(temp_image_path)
-        
-        response = gemini_vision_model.generate_content([
-            "Describe what you see in this image in detail",
-            img
-        ])
 
-        # Clean up temp file
-        if os.path.exists(temp_image_path):
-            os.remove(temp_image_path)
+def stream_sid(data):
+    """The Socket.IO sid the request's "stream_token" was issued to, or None"""
+    token = data.get('stream_token')
+    if not isinstance(token, str):
+        return None
+    with _stream_tokens_lock:
+        return _stream_tokens.get(token)
 
-        return response.text
 
+class AnswerStream:
+    """
+    Streaming mode for a Q&A request ({"stream": true, "stream_token": ...},
+    the token from 'connection_response'): partial model output goes to
+    that client's Socket.IO room as 'answer_chunk' events, then
+    'answer_complete' with the REST payload, or 'answer_error'. Every event
+    carries the request_id.
+    """
+
+    def __init__(self, sid, request_id=None):
+        self.sid = sid
+        self.request_id = request_id or uuid.uuid4().hex
+        self.chunks = 0
+
+    @classmethod
+    def from_request(cls, data):
+        """An AnswerStream if the request asked for one with a valid token, else None (plain REST)"""
+        if not data.get('stream'):
+            return None
+        sid = stream_sid(data)
+        if sid is None:
+            print("⚠️ Streaming requested without a valid stream_token; answering over REST only")
+            return None
+        return cls(sid, data.get('request_id'))
+
+    def chunk(self, text):
+        socketio.emit('answer_chunk', {'request_id': self.request_id, 'index': self.chunks, 'text': text},
+                      to=self.sid)
+        self.chunks += 1
+
+    def complete(self, payload):
+        socketio.emit('answer_complete', {'request_id': self.request_id, **payload}, to=self.sid)
+
+    def error(self, message):
+        socketio.emit('answer_error', {'request_id': self.request_id, 'error': message}, to=self.sid)
+
+
+def answer_error(stream, message, status):
+    """JSON error response; a streaming client is also sent 'answer_error'"""
+    if stream:
+        stream.error(message)
+    return jsonify({"error": message}), status
+
+
+def generate_answer(site, contents, model=TEXT_MODEL, stream=None):
+    """Full answer text; with an AnswerStream each chunk is also sent as Gemini produces it"""
+    if stream is None:
+        return llm_client.generate(site, contents, model=model)
+    parts = []
+    for text in llm_client.stream(site, contents, model=model):
+        parts.append(text)
+        stream.chunk(text)
+    return "".join(parts)
+
+
+def describe_frame(frame, prompt, camera=None, site="vision.describe", stream=None):
+    """
+    Gemini vision answer to prompt for a decoded frame. Answers are cached per
+    camera (uid, else the image URL) and prompt; a frame whose dHash is within
+    the camera's threshold of a cached one within the TTL skips the model.
+    """
+    camera = camera or frame.source
+    threshold = frame_cache_threshold(camera)
+    frame_hash = dhash(frame.image)
+    cached = frame_description_cache.get(camera, prompt, frame_hash, threshold)
+    if cached is not None:
+        if stream is not None:
+            stream.chunk(cached)
+        return cached
+
+    def call():
+        text = generate_answer(site, [prompt, frame.image], model=VISION_MODEL, stream=stream)
+        if threshold is None or threshold >= 0:
+            frame_description_cache.set(camera, prompt, frame_hash, text)
+        return text
+
+    if stream is not None:
+        return call()
+    # Operators asking the same thing about the same frame at once share one vision call
+    return inflight.do("vision", cache_key(VISION_MODEL, camera, prompt, hashlib.sha256(frame.data).hexdigest()), call)
+
+
+def describe_camera(image_url, frame=None, camera=None):
+    """Gemini vision description of a camera frame; raises if the download or the vision call fails."""
+    # Step 1: Download the image into memory
+    if frame is None:
+        frame = fetch_frame(image_url)
+
+    # Step 2: Use Gemini Vision API on the decoded frame, unless this scene was just described
+    return describe_frame(frame, "Describe what you see in this image in detail", camera)
+
+
+def describe_error(e):
+    """The message a failed describe_camera reports"""
+    if isinstance(e, requests.exceptions.HTTPError):
+        return f"Failed to download image, status code: {e.response.status_code}"
+    return f"Error analyzing image: {str(e)}"
+
+
+def getImage_Description(image_url, frame=None, camera=None):
+    """Gemini vision description of a camera frame; pass `frame` when it is already downloaded."""
+    try:
+        return describe_camera(image_url, frame, camera)
     except Exception as e:
-        # Clean up temp file in case of error
-        if os.path.exists("temp_image.jpg"):
-            os.remove("temp_image.jpg")
-        return f"Error analyzing image: {str(e)}"
+        return describe_error(e)
     
 
 def GPT_Call(query):
@@ -133,15 +217,18 @@ def GPT_Call(query):
     query (str): The query to be passed to the Gemini model.
     
     Returns:
-    dict: The response from the Gemini model.
+    dict: The response from the Gemini model. Parsed responses are cached
+    for LLM_RESPONSE_CACHE_TTL seconds; errors are never cached.
     """
     try:
         # Add instruction to return JSON in the prompt
         prompt = f"{query}\n\nPlease respond with valid JSON only."
-        response = gemini_model.generate_content(prompt)
-        
-        # Get the content of the response
-        response_content = response.text
+        key = llm_response_cache.key(TEXT_MODEL, prompt)
+        cached = llm_response_cache.get(key)
+        if cached is not None:
+            return cached
+
+        response_content = llm_client.generate("gpt_call", prompt)
         
         # Try to parse the response as JSON
         try:
@@ -152,6 +239,7 @@ def GPT_Call(query):
                 response_content = response_content.split("```")[1].split("```")[0].strip()
             
             response_json = json.loads(response_content)
+            llm_response_cache.set(key, response_json)
             return response_json
         except json.JSONDecodeError:
             # If the response is not valid JSON, return an error
@@ -160,40 +248,144 @@ def GPT_Call(query):
         # If there is an error making the call to the Gemini model, return an error
         return {"error": str(e)}
     
-def embed_text(text):
+def embed_text(text, task_type="retrieval_document"):
     """
-    Generate text embeddings using Gemini API
+    Generate text embeddings using Gemini API, served from the embedding
+    cache when the same model, task type and text were embedded before
     """
+    key = embedding_cache.key(EMBEDDING_MODEL, task_type, text)
+    cached = embedding_cache.get(key)
+    if cached is not None:
+        return cached
+
     try:
-        result = genai.embed_content(
-            model="models/text-embedding-004",
+        result = llm_client.embed(
+            "embed_text",
+            model=EMBEDDING_MODEL,
             content=text,
-            task_type="retrieval_document"
+            task_type=task_type
         )
-        return result['embedding']
+        embedding = result['embedding']
+        if any(embedding):
+            embedding_cache.set(key, embedding)
+        return embedding
     except Exception as e:
         print(f"Error generating embedding: {str(e)}")
-        # Return a zero vector as fallback
+        # Return a zero vector as fallback (never cached)
         return [0.0] * 768
 
+def embed_texts(texts, task_type="retrieval_document"):
+    """
+    Batch version of embed_text: cached texts are served locally and the rest
+    are embedded EMBEDDING_BATCH_SIZE at a time. Failed entries come back as None.
+    """
+    keys = [embedding_cache.key(EMBEDDING_MODEL, task_type, text) for text in texts]
+    embeddings = [embedding_cache.get(key) for key in keys]
+    missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+
+    for start in range(0, len(missing), EMBEDDING_BATCH_SIZE):
+        batch = missing[start:start + EMBEDDING_BATCH_SIZE]
+        try:
+            result = llm_client.embed(
+                "embed_texts",
+                model=EMBEDDING_MODEL,
+                content=[texts[i] for i in batch],
+                task_type=task_type
+            )
+        except Exception as e:
+            print(f"Error generating batch embeddings: {str(e)}")
+            continue
+        for i, embedding in zip(batch, result['embedding']):
+            if any(embedding):
+                embedding_cache.set(keys[i], embedding)
+                embeddings[i] = embedding
+    return embeddings
+
+# One-time migration of cameras registered with the old chromadb backend
+try:
+    imported = import_chroma(camera_collection, LEGACY_CHROMA_DIR, embed_fn=embed_texts)
+    if imported:
+        print(f"✅ Imported {imported} cameras from {LEGACY_CHROMA_DIR}")
+except Exception as e:
+    print(f"⚠️ Failed to import legacy chroma cameras: {e}")
+
+# Known-face encodings, computed once and cached on disk between restarts;
+# files dropped into known_faces/ later are picked up by the watcher thread
+face_gallery = FaceGallery(KNOWN_FACES_DIR, os.path.join(CACHE_DIR, "face_gallery.npz"))
+try:
+    face_gallery.refresh()
+except Exception as e:
+    print(f"⚠️ Failed to load known faces: {e}")
+face_gallery.watch()
+
 @app.route('/api/hello-world')
 def hello_world():
     return 'Hello, World!'
 
+
+@app.route('/api/cache_stats', methods=['GET'])
+def cache_stats():
+    """Hit/miss counters for the model-call caches"""
+    return jsonify({
+        'success': True,
+        'caches': {
+            'embeddings': embedding_cache.stats(),
+            'frame_descriptions': frame_description_cache.stats(),
+            'llm_responses': llm_response_cache.stats()
+        }
+    })
+
+
+@app.route('/api/llm_stats', methods=['GET'])
+def llm_stats():
+    """Rate limiter settings, per-call-site latency/error metrics and request coalescing counts"""
+    return jsonify({'success': True, 'llm': llm_client.stats(), 'coalescing': inflight.stats()})
+
+# Local fast path for query_determine; low-confidence prompts still go to Gemini
+INTENT_EMBEDDINGS = os.getenv("INTENT_EMBEDDINGS", "false").lower() in ("1", "true", "yes")
+intent_classifier = IntentClassifier(
+    load_locations(os.getenv("INTENT_LOCATIONS_FILE")),
+    embed=(lambda text: embed_text(text, task_type="retrieval_query")) if INTENT_EMBEDDINGS else None,
+    replay_path=os.getenv("INTENT_REPLAY_LOG", os.path.join(CACHE_DIR, "intent_replay.jsonl"))
+)
+if INTENT_EMBEDDINGS:
+    threading.Thread(target=intent_classifier.train_from_replay, daemon=True).start()
+
+
+def shadow_check_intent(prompt, intent):
+    """Ask Gemini about a prompt the fast path already answered, for agreement stats and the replay log"""
+    llm_intent = parse_llm_intent(GPT_Call(intent_classifier.llm_prompt(prompt)))
+    if llm_intent is not None:
+        intent_classifier.record_shadow(prompt, intent, llm_intent)
+
+
 @app.route('/api/query_determine', methods=['POST'])
 def query_determine():
     try:
         data = request.json
         if not data or 'prompt' not in data:
             return jsonify({'error': 'No prompt provided'}), 400
-            
-        query = "Return in valid JSON only. First, examine the following user query and determine if it states/matches any of the following locations: {382732:Denver, 1:Austin}. If it is, please return the index of the place in the json response in ‘location’ if no location exists, return -1. Finally, check if this requires a 'face_search' , return True of False. This query should be checking if the user is asking to get details on a face or not. Here is an example query “Find me the person who is on stage in ethDenver now” —> return JSON: {“location”:382732, “face_search”:true} explanation: we need 382732th location(denver) and we need face search to get the person. here is another example:  “Find me the person in orange jumpsuit escaping prison” —> return JSON: {“location”:-1, “face_search”:true}. Explanation: we cant search by location bc we dont know and it doesnt match the location searches,. we need face_search to get the face details. “Find the stolen red car” —> return JSON: {“location”:-1, “face_search”:false}. Explanation: we cant search by location bc we dont know and it doesnt match the location searches,. we cant use face_search because we arent searching for a specific face. thanks! USER QUERY:" + data['prompt'] 
-        
-        ret = GPT_Call(query)
+
+        intent = intent_classifier.classify(data['prompt'])
+        if intent_classifier.confident(intent):
+            if intent_classifier.sample_shadow():
+                threading.Thread(target=shadow_check_intent, args=(data['prompt'], intent), daemon=True).start()
+            return jsonify({'location': intent['location'], 'face_search': intent['face_search']})
+
+        ret = GPT_Call(intent_classifier.llm_prompt(data['prompt']))
+        llm_intent = parse_llm_intent(ret)
+        if llm_intent is not None:
+            intent_classifier.learn(data['prompt'], llm_intent)
         return jsonify(ret)
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/intent_stats', methods=['GET'])
+def intent_stats():
+    """How often query_determine was answered locally versus by Gemini, and shadow-checked agreement"""
+    return jsonify({'success': True, 'intent': intent_classifier.stats()})
     
 
 @app.route('/api/search_cameras_description', methods=['POST'])
@@ -203,15 +395,39 @@ def search_camera_description():
         if not data or "query" not in data:
             return jsonify({'error': 'No query provided'}), 400
 
+        n_results = int(data.get('n_results', 1))
+        if n_results < 1:
+            return jsonify({'error': 'n_results must be at least 1'}), 400
+
+        where = data.get('where')
+        if where is not None and not isinstance(where, dict):
+            return jsonify({'error': 'where must be an object'}), 400
+
+        # Vector similarity and BM25 over the descriptions, fused by rank, so
+        # exact terms like street names or camera models still count
         query_embedding = embed_text(data['query'])
-        result = camera_collection.query(
-            query_embeddings=[query_embedding],
-            n_results=1
-        )
-        for cam_id, metadata in zip(result.get("ids", [])[0], result.get("metadatas", [])[0]):
-            return jsonify({"uid": cam_id, **metadata})
-        
-        #we do it this way just to return first result
+        try:
+            result = camera_collection.hybrid_query(
+                query_embedding,
+                data['query'],
+                n_results=n_results,
+                where=where
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        matches = [
+            {"uid": cam_id, "distance": distance, "score": score, **metadata}
+            for cam_id, metadata, distance, score in zip(
+                result["ids"], result["metadatas"], result["distances"], result["scores"]
+            )
+        ]
+        if not matches:
+            return jsonify({'error': 'No cameras found'}), 404
+
+        # Callers that ask for n_results get the ranked list, others the best match
+        if 'n_results' in data:
+            return jsonify({"results": matches})
+        return jsonify(matches[0])
     except Exception as e:
         return jsonify({'error': str(e)}), 500
     
@@ -246,30 +462,130 @@ def search_camera_location():
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/filter_cameras', methods=['POST'])
+def filter_cameras():
+    """
+    Return cameras matching a metadata filter, e.g.
+    {"where": {"location": "39.6,-105.2", "tokenId": {"$in": [1, 2]}}}.
+    Filterable fields: location, ipId, tokenId, CID.
+    """
+    try:
+        data = request.json
+        where = data.get('where') if data else None
+        if not isinstance(where, dict) or not where:
+            return jsonify({'error': 'No where filter provided'}), 400
+
+        try:
+            result = camera_collection.get(where=where)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        cameras = [{"uid": cam_id, **metadata} for cam_id, metadata in zip(result["ids"], result["metadatas"])]
+        return jsonify({'cameras': cameras, 'total': len(cameras)})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/search_cameras_near', methods=['POST'])
+def search_cameras_near():
+    """
+    Cameras closest to an incident: {"lat", "lon", "k"?, "radius_km"?}.
+    Returns the k nearest (default 10), limited to radius_km when given;
+    with only radius_km, every camera inside the radius.
+    """
+    try:
+        data = request.json
+        if not data or "lat" not in data or "lon" not in data:
+            return jsonify({'error': 'lat and lon are required'}), 400
+
+        lat, lon = float(data['lat']), float(data['lon'])
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+            return jsonify({'error': 'lat/lon out of range'}), 400
+
+        radius_km = float(data['radius_km']) if data.get('radius_km') is not None else None
+        if 'k' in data:
+            k = int(data['k'])
+        else:
+            k = None if radius_km is not None else 10
+        if k is not None and k < 1:
+            return jsonify({'error': 'k must be at least 1'}), 400
+
+        result = camera_collection.near(lat, lon, k=k, radius_km=radius_km)
+        cameras = [
+            {"uid": cam_id, "distance_km": distance, **metadata}
+            for cam_id, metadata, distance in zip(result["ids"], result["metadatas"], result["distances_km"])
+        ]
+        return jsonify({'cameras': cameras, 'total': len(cameras)})
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': f'Invalid parameters: {str(e)}'}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+def _camera_listing(endpoint, build_item, wrap):
+    """
+    Serve a camera listing with cursor pagination (?limit=&cursor=), field
+    projection (?fields=uid,stream_url) and ETags. Serialized bodies are
+    cached under the collection version, so an unchanged poll is a lookup
+    and a matching If-None-Match is answered with 304 without touching the store.
+    """
+    limit = request.args.get('limit', type=int)
+    cursor = request.args.get('cursor', type=int)
+    fields = request.args.get('fields')
+    if limit is not None and limit < 1:
+        return jsonify({'error': 'limit must be at least 1'}), 400
+    if 'cursor' in request.args and cursor is None:
+        return jsonify({'error': 'Invalid cursor'}), 400
+
+    version = camera_collection.version()
+    etag = f"{endpoint}-{version}-{cache_key(limit, cursor, fields)[:16]}"
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        body = response_cache.get(etag)
+        if body is None:
+            page = camera_collection.page(after=cursor, limit=limit)
+            items = [
+                build_item(cam_id, metadata, document)
+                for cam_id, metadata, document in zip(page["ids"], page["metadatas"], page["documents"])
+            ]
+            if fields:
+                wanted = [field.strip() for field in fields.split(',') if field.strip()]
+                items = [{field: item[field] for field in wanted if field in item} for item in items]
+            body = json.dumps(wrap(items, page["next_cursor"], limit is not None))
+            # Don't cache a page that raced with a write
+            if camera_collection.version() == version:
+                response_cache.set(etag, body)
+        response = app.response_class(body, mimetype='application/json')
+
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
 # 2. Endpoint that returns all camera objects.
 @app.route('/api/get_all_cameras', methods=['GET'])
 def get_cameras():
+    """
+    All cameras as a list; with ?limit= a page object
+    {"cameras": [...], "next_cursor": ...} instead.
+    """
     try:
-        result = camera_collection.get(include=["metadatas", "documents"])
-        cameras = []
-        ids = result.get("ids", [])
-        metadatas = result.get("metadatas", [])
-        for cam_id, metadata in zip(ids, metadatas):
-            cameras.append({"uid": cam_id, **metadata})
-        return jsonify(cameras)
+        return _camera_listing(
+            'cameras',
+            lambda cam_id, metadata, document: {"uid": cam_id, **metadata},
+            lambda items, next_cursor, paginated: (
+                {"cameras": items, "next_cursor": next_cursor} if paginated else items
+            )
+        )
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/clear_db', methods=['GET'])
 def clear_db():
 
-    result = camera_collection.get(include=["metadatas", "documents"])
-    cameras = []
-    ids = result.get("ids", [])
-
-    camera_collection.delete(
-    ids=ids,
-    )
+    camera_collection.clear()
+    forget_pending(camera_collection)
 
     return jsonify({'message': 'Database cleared'}), 200
 
@@ -285,21 +601,27 @@ def delete_cameras():
             return jsonify({'error': 'uids must be a list'}), 400
 
         # Check if the UIDs are valid and exist in the database
-        result = camera_collection.get(include=["metadatas", "documents"])
-        ids = result.get("ids", [])
-        invalid_uids = [uid for uid in uids if uid not in ids]
+        existing = camera_collection.existing_ids(uids)
+        invalid_uids = [uid for uid in uids if uid not in existing]
         if invalid_uids:
             return jsonify({'error': f'Invalid UIDs: {invalid_uids}'}), 400
 
         camera_collection.delete(ids=uids)
+        forget_pending(camera_collection, uids)
         return jsonify({'message': 'Cameras deleted successfully'}), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/answer_query_no_face', methods=['POST'])
 def answer_query_no_face():
+    """
+    Answers a prompt about a camera's current frame. Add "stream": true and
+    the client's "stream_token" to also receive the answer as it is
+    generated (see AnswerStream); the JSON response is unchanged.
+    """
     print("STARTED ANSWER QUERY NO FACE")
 
+    stream = None
     try:
         data = request.get_json()
         if not data:
@@ -307,13 +629,14 @@ def answer_query_no_face():
             return jsonify({"error": "No JSON data received"}), 400
 
         print("RECEIVED DATA:", data)  # Debugging log
+        stream = AnswerStream.from_request(data)
 
         cam_data = data.get('cam')
         prompt = data.get('prompt')
 
         if not cam_data or not prompt:
             print("ERROR: Missing 'cam' or 'prompt' in request")
-            return jsonify({"error": "Missing 'cam' or 'prompt'"}), 400
+            return answer_error(stream, "Missing 'cam' or 'prompt'", 400)
 
         print("GOT CAM DATA", cam_data)
         print("GOT PROMPT", prompt)
@@ -322,167 +645,293 @@ def answer_query_no_face():
 
         if not image_url:
             print("ERROR: No image URL provided")
-            return jsonify({"error": "No image URL provided"}), 400
+            return answer_error(stream, "No image URL provided", 400)
+
+        # Step 1: Download the image into memory
+        try:
+            frame = fetch_frame(image_url)
+        except requests.exceptions.HTTPError as e:
+            status_code = e.response.status_code
+            print(f"Failed to download image, status code: {status_code}")
+            return answer_error(stream, f"Failed to download image, status code: {status_code}", 500)
+
+        # Step 2: Use Gemini Vision API on the decoded frame, unless this scene was just asked about
+        answer = describe_frame(
+            frame,
+            f"You have an image that will help answer the prompt. The user prompt: {prompt} and the image is shown below. Please provide a response to the user prompt using the image.",
+            cam_data.get('uid'),
+            site="answer_query_no_face",
+            stream=stream
+        )
 
-        # Step 1: Download the image
-        response = requests.get(image_url, stream=True)
+        result = {"response": answer}
+        if stream:
+            stream.complete(result)
+            result["request_id"] = stream.request_id
+        return jsonify(result)
 
-        if response.status_code != 200:
-            print(f"Failed to download image, status code: {response.status_code}")
-            return jsonify({"error": f"Failed to download image, status code: {response.status_code}"}), 500
+    except LLMTimeout as e:
+        print(f"Gemini busy: {str(e)}")
+        return answer_error(stream, str(e), 503)
+    except Exception as e:
+        print(f"Error analyzing image: {str(e)}")
+        return answer_error(stream, f"Error analyzing image: {str(e)}", 500)
 
-        # Step 2: Save image temporarily
-        img_data = response.content
-        temp_image_path = "temp_query_image.jpg"
-        with open(temp_image_path, "wb") as f:
-            f.write(img_data)
 
-        # Step 3: Use Gemini Vision API for analysis
-        from PIL import Image as PILImage
-        img = PILImage.open(temp_image_path)
-        
-        gemini_response = gemini_vision_model.generate_content([
-            f"You have an image that will help answer the prompt. The user prompt: {prompt} and the image is shown below. Please provide a response to the user prompt using the image.",
-            img
-        ])
+CAMERA_REQUIRED_FIELDS = ["uid", "location", "image_url", "description", "txHash", "ipId", "tokenId", "CID"]
+BULK_REGISTRATION_WORKERS = int(os.getenv("BULK_REGISTRATION_WORKERS", "16"))
 
-        # Clean up temp file
-        if os.path.exists(temp_image_path):
-            os.remove(temp_image_path)
 
-        return jsonify({"response": gemini_response.text})
+def _check_camera_settings(data):
+    """Reject unknown face_detection settings and out-of-range frame_cache_threshold at registration"""
+    if data.get('face_detection'):
+        detection_config(data['face_detection'])
+    check_threshold(data.get('frame_cache_threshold'))
 
-    except Exception as e:
-        print(f"Error analyzing image: {str(e)}")
-        return jsonify({"error": f"Error analyzing image: {str(e)}"}), 500
+
+def _camera_metadata(data, image_frame_description):
+    metadata = {
+        "location": data['location'],
+        "image_url": data['image_url'],
+        "description": data['description'] + image_frame_description,            
+        "txHash": data['txHash'],
+        "ipId": data['ipId'],
+        "tokenId": data['tokenId'],
+        "CID": data['CID']
+    }
+    if data.get('face_detection'):
+        metadata["face_detection"] = data['face_detection']
+    if data.get('frame_cache_threshold') is not None:
+        metadata["frame_cache_threshold"] = data['frame_cache_threshold']
+    return metadata
+
+
+def _camera_log_entries(data):
+    """Elasticsearch footage and transaction entries for a camera registration"""
+    footage = dict(
+        camera_id=data['uid'],
+        camera_name=data['description'],
+        location=data['location'],
+        stream_url=data['image_url'],
+        metadata={
+            "ipId": data['ipId'],
+            "tokenId": data['tokenId']
+        },
+        tx_hash=data['txHash'],
+        ipfs_cid=data['CID']
+    )
+    transaction = dict(
+        transaction_type="camera_registration",
+        user_address=data.get('user_address', 'unknown'),
+        blockchain="sui",
+        tx_hash=data['txHash'],
+        status="success",
+        details={
+            "camera_id": data['uid'],
+            "ipId": data['ipId'],
+            "tokenId": data['tokenId'],
+            "CID": data['CID']
+        },
+        related_camera_id=data['uid']
+    )
+    return footage, transaction
 
 
 @app.route('/api/add_camera', methods=['POST'])
 def add_camera():
     try:
         data = request.json
-        required_fields = ["uid", "location", "image_url", "description", "txHash", "ipId", "tokenId", "CID"]
-        if any(field not in data for field in required_fields):
+        if any(field not in data for field in CAMERA_REQUIRED_FIELDS):
             print("missing fields")
             return jsonify({'error': 'Missing fields in request'}), 400
+        _check_camera_settings(data)
 
-
-        image_frame_description = getImage_Description(data['image_url'])
+        image_frame_description = getImage_Description(data['image_url'], camera=data['uid'])
 
         # Vector embed the description.
         embedding = embed_text(data['description'] + image_frame_description)
 
-        # Add camera stream to the Chroma collection.
+        # Add camera stream to the camera collection.
         camera_collection.add(
             documents=[data['description']],
-            metadatas=[{
-                "location": data['location'],
-                "image_url": data['image_url'],
-                "description": data['description'] + image_frame_description,            
-                "txHash": data['txHash'],
-                "ipId": data['ipId'],
-                "tokenId": data['tokenId'],
-                "CID": data['CID']
-            }],
+            metadatas=[_camera_metadata(data, image_frame_description)],
             ids=[data['uid']],
             embeddings=[embedding]
         )
+        forget_pending(camera_collection, [data['uid']])
         
         # Log to Elasticsearch
         if es_manager:
             try:
-                es_manager.log_cctv_footage(
-                    camera_id=data['uid'],
-                    camera_name=data['description'],
-                    location=data['location'],
-                    stream_url=data['image_url'],
-                    metadata={
-                        "ipId": data['ipId'],
-                        "tokenId": data['tokenId']
-                    },
-                    tx_hash=data['txHash'],
-                    ipfs_cid=data['CID']
-                )
-                es_manager.log_transaction(
-                    transaction_type="camera_registration",
-                    user_address=data.get('user_address', 'unknown'),
-                    blockchain="sui",
-                    tx_hash=data['txHash'],
-                    status="success",
-                    details={
-                        "camera_id": data['uid'],
-                        "ipId": data['ipId'],
-                        "tokenId": data['tokenId'],
-                        "CID": data['CID']
-                    },
-                    related_camera_id=data['uid']
-                )
+                footage, transaction = _camera_log_entries(data)
+                es_manager.log_cctv_footage(**footage)
+                es_manager.log_transaction(**transaction)
             except Exception as es_error:
                 print(f"⚠️ Failed to log to Elasticsearch: {es_error}")
         
         return jsonify({'message': 'Camera added successfully'}), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         print(f"Error adding camera: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
 
-
-def download_image(image_url):
-    """Downloads an image from a URL and saves it locally."""
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-    }
-    
+@app.route('/api/add_cameras_bulk', methods=['POST'])
+def add_cameras_bulk():
+    """
+    Register many cameras in one request.
+
+    Frames are downloaded and described concurrently (bounded by
+    BULK_REGISTRATION_WORKERS), descriptions are embedded in batches, and
+    the cameras are written to the collection and Elasticsearch in one bulk
+    step. With the client's "stream_token" (see AnswerStream) in the body,
+    progress is sent to that client only as 'bulk_registration_progress' events; the response
+    carries a result for every item, in request order.
+    """
     try:
-        response = requests.get(image_url, headers=headers, stream=True, allow_redirects=True)
-        response.raise_for_status()  # Raise error if request fails
-        
-        image_path = "input_image.jpg"
-        with open(image_path, "wb") as f:
-            for chunk in response.iter_content(1024):
-                f.write(chunk)
-        return image_path
-    except requests.exceptions.RequestException as e:
-        print(f"Error downloading image: {e}")
-        return None
+        data = request.json
+        cameras = data.get('cameras') if data else None
+        if not isinstance(cameras, list) or not cameras:
+            return jsonify({'error': 'cameras must be a non-empty list'}), 400
+
+        total = len(cameras)
+        job_id = data.get('job_id') or f"bulk_{int(time.time())}_{total}"
+        results = [None] * total
+        sid = stream_sid(data)
+
+        def emit_progress(stage, completed):
+            if not sid:
+                return
+            socketio.emit('bulk_registration_progress', {
+                'job_id': job_id,
+                'stage': stage,
+                'completed': completed,
+                'total': total
+            }, to=sid)
+
+        valid = []
+        for i, camera in enumerate(cameras):
+            if isinstance(camera, dict) and all(field in camera for field in CAMERA_REQUIRED_FIELDS):
+                try:
+                    _check_camera_settings(camera)
+                    valid.append(i)
+                except ValueError as e:
+                    results[i] = {'uid': camera['uid'], 'status': 'error', 'error': str(e)}
+            else:
+                uid = camera.get('uid') if isinstance(camera, dict) else None
+                results[i] = {'uid': uid, 'status': 'error', 'error': 'Missing fields in request'}
+
+        # Step 1: download and describe every frame concurrently; a camera
+        # whose frame can't be described is reported, not indexed
+        descriptions = {}
+        if valid:
+            with ThreadPoolExecutor(max_workers=min(BULK_REGISTRATION_WORKERS, len(valid))) as pool:
+                futures = {pool.submit(describe_camera, cameras[i]['image_url'], camera=cameras[i]['uid']): i for i in valid}
+                for completed, future in enumerate(as_completed(futures), 1):
+                    i = futures[future]
+                    try:
+                        descriptions[i] = future.result()
+                    except Exception as e:
+                        results[i] = {'uid': cameras[i]['uid'], 'status': 'error', 'error': describe_error(e)}
+                    emit_progress('describing', completed)
+            valid = [i for i in valid if i in descriptions]
+
+        # Step 2: embed the combined descriptions in batches
+        texts = [cameras[i]['description'] + descriptions[i] for i in valid]
+        embeddings = embed_texts(texts)
+        emit_progress('embedding', len(valid))
+
+        # Step 3: one bulk write to the collection and Elasticsearch
+        ids, documents, metadatas, vectors = [], [], [], []
+        footage_entries, transaction_entries = [], []
+        for i, embedding in zip(valid, embeddings):
+            camera = cameras[i]
+            if embedding is None:
+                results[i] = {'uid': camera['uid'], 'status': 'error', 'error': 'Failed to generate embedding'}
+                continue
+            ids.append(camera['uid'])
+            documents.append(camera['description'])
+            metadatas.append(_camera_metadata(camera, descriptions[i]))
+            vectors.append(embedding)
+            footage, transaction = _camera_log_entries(camera)
+            footage_entries.append(footage)
+            transaction_entries.append(transaction)
+            results[i] = {'uid': camera['uid'], 'status': 'added'}
 
-def encode_known_faces():
-    """Encodes all known faces and returns a dictionary {name: encoding}."""
-    known_encodings = {}
-    
-    for filename in os.listdir(KNOWN_FACES_DIR):
-        filepath = os.path.join(KNOWN_FACES_DIR, filename)
-        if not filename.endswith(('.jpg', '.jpeg', '.png')):
-            continue
-        
-        name = os.path.splitext(filename)[0]  # Extract name from filename
-        image = face_recognition.load_image_file(filepath)
-        encodings = face_recognition.face_encodings(image)
+        if ids:
+            camera_collection.add(ids=ids, documents=documents, metadatas=metadatas, embeddings=vectors)
+            forget_pending(camera_collection, ids)
+            if es_manager:
+                try:
+                    es_manager.bulk_log(cctv_footage=footage_entries, transactions=transaction_entries)
+                except Exception as es_error:
+                    print(f"⚠️ Failed to log to Elasticsearch: {es_error}")
+
+        emit_progress('completed', total)
+        return jsonify({
+            'success': True,
+            'job_id': job_id,
+            'total': total,
+            'added': len(ids),
+            'failed': total - len(ids),
+            'results': results
+        }), 200
+    except Exception as e:
+        print(f"Error adding cameras in bulk: {str(e)}")
+        return jsonify({'error': str(e)}), 500
 
-        if encodings:
-            known_encodings[name] = encodings[0]
-    
-    return known_encodings
 
-def recognize_faces(image_path, known_encodings):
-    """Compares an input image with known faces and returns the closest match."""
-    unknown_image = face_recognition.load_image_file(image_path)
-    unknown_encodings = face_recognition.face_encodings(unknown_image)
 
-    if not unknown_encodings:
-        return None  # No face detected in the input image.
+# dlib holds the GIL while detecting and encoding, so face work runs in processes
+FACE_WORKERS = int(os.getenv("FACE_WORKERS", str(os.cpu_count() or 2)))
+_face_pool = None
+_face_pool_lock = threading.Lock()
+
+
+def face_pool():
+    """Process pool shared by face encoding endpoints, started on first use"""
+    global _face_pool
+    with _face_pool_lock:
+        if _face_pool is None:
+            _face_pool = ProcessPoolExecutor(max_workers=FACE_WORKERS)
+        return _face_pool
 
-    unknown_encoding = unknown_encodings[0]
-    
-    for name, known_encoding in known_encodings.items():
-        match = face_recognition.compare_faces([known_encoding], unknown_encoding, tolerance=0.6)
-        if match[0]:
-            return name  # Match found
-    
-    return None  # No match found.
+
+def recognize_faces(unknown_image, gallery, config=None):
+    """
+    Identifies every face in a decoded RGB image against the known-face gallery.
+    Detection runs on a downscaled copy and only full-resolution face crops
+    are encoded (see face_pipeline). Returns one entry per face: name (None
+    if unknown), distance, margin to the runner-up identity and box, closest
+    match first.
+    """
+    locations, unknown_encodings, _ = detect_and_encode(unknown_image, config)
+    return identify_faces(gallery, locations, unknown_encodings)
+
+
+def face_detection_settings(data, camera_metadata=None):
+    """Detection config: defaults, then the camera's "face_detection" metadata, then the request's."""
+    overrides = dict((camera_metadata or {}).get('face_detection') or {})
+    overrides.update(data.get('face_detection') or {})
+    return detection_config(overrides)
+
+
+def identify_faces(gallery, locations, encodings, tolerance=DEFAULT_TOLERANCE):
+    """Gallery matches for detected faces, with their boxes, closest match first."""
+    faces = [
+        {**match, "box": {"top": top, "right": right, "bottom": bottom, "left": left}}
+        for match, (top, right, bottom, left) in zip(gallery.identify(encodings, tolerance), locations)
+    ]
+    return sorted(faces, key=lambda face: float("inf") if face["distance"] is None else face["distance"])
 
 @app.route('/api/answer_query_face', methods=['POST'])
 def answer_query_face():
+    """
+    Identifies the closest known face in a frame and asks Gemini about them.
+    Supports the same optional Socket.IO streaming mode as answer_query_no_face.
+    """
+    stream = None
     try:
         data = request.get_json()
         if not data:
@@ -490,51 +939,283 @@ def answer_query_face():
             return jsonify({"error": "No JSON data received"}), 400
         
         print("RECEIVED DATA:", data)  # Debugging log
+        stream = AnswerStream.from_request(data)
         cam_url = data.get('cam_url')
         
         if not cam_url:
             print("ERROR: No cam_url provided")
-            return jsonify({"error": "No cam_url provided"}), 400
+            return answer_error(stream, "No cam_url provided", 400)
+
+        # Per-camera detection settings when the caller says which camera this is
+        camera = camera_collection.get(ids=[data['uid']]) if data.get('uid') else {'metadatas': []}
+        try:
+            config = face_detection_settings(data, (camera['metadatas'] or [None])[0])
+        except ValueError as e:
+            return answer_error(stream, str(e), 400)
         
-        # Step 1: Download the image from the URL
+        # Step 1: Download the image from the URL into memory
         print("Downloading image from URL...")
-        image_path = download_image(cam_url)
-        
-        if not image_path:
-            return jsonify({"error": "Failed to download image from URL"}), 500
-        
-        # Step 2: Encode known faces
-        print("Encoding known faces...")
-        known_faces = encode_known_faces()
+        try:
+            frame = fetch_frame(cam_url)
+        except requests.exceptions.RequestException as e:
+            print(f"Error downloading image: {e}")
+            return answer_error(stream, "Failed to download image from URL", 500)
         
-        # Step 3: Recognize faces in the downloaded image
+        # Step 2: Recognize faces in the downloaded image against the current gallery
         print("Recognizing faces...")
-        recognized_name = recognize_faces(image_path, known_faces)
+        faces = recognize_faces(frame.array, face_gallery, config)
         
-        if not recognized_name:
-            recognized_name = "Unknown"  # Default value if no match is found
+        # Closest identified face, "Unknown" if no face is within tolerance
+        recognized_name = next((face["name"] for face in faces if face["name"]), "Unknown")
         
         print("HYPER ANSWER:", recognized_name)
 
-        # Step 4: Use Gemini to get additional information about the person
+        # Step 3: Use Gemini to get additional information about the person
         prompt = f"NAME: {recognized_name}. Given someone's name, try to find details about them, such as age, profession, LinkedIn, Twitter. Return with no extra words and include name. If you cannot find information, just return CANNOT FIND for each field. Return in this format:\nNAME: Bob\nAGE: 22\nPROFESSION: Software Engineer\nLINKEDIN: https://linkedin.com/bob\nTWITTER: https://twitter.com/bob"
         
-        response = gemini_model.generate_content(prompt)
-        
-        print(response)
-        
-        # Extract and return the response content
-        result_content = response.text
+        result_content = generate_answer("answer_query_face", prompt, stream=stream)
         print(result_content)
 
-        return jsonify({"response": result_content})
+        result = {"response": result_content, "faces": faces}
+        if stream:
+            stream.complete(result)
+            result["request_id"] = stream.request_id
+        return jsonify(result)
 
+    except LLMTimeout as e:
+        print(f"Gemini busy: {str(e)}")
+        return answer_error(stream, str(e), 503)
     except Exception as e:
         print(f"ERROR: {e}")
-        return jsonify({'error': str(e)}), 500
+        return answer_error(stream, str(e), 500)
     # Email and Agent functionality removed as per user requirements
 
 
+@app.route('/api/cameras/face_detection', methods=['POST'])
+def set_camera_face_detection():
+    """
+    Set a camera's face detection settings, e.g. {"uid": "cam1", "face_detection":
+    {"model": "cnn", "max_side": 1920, "min_face_px": 32, "min_sharpness": 50}}.
+    Omitted settings use the defaults; an empty object resets the camera to them.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        uid = data.get('uid')
+        overrides = data.get('face_detection')
+        if not uid or not isinstance(overrides, dict):
+            return jsonify({'error': 'Provide uid and a face_detection object'}), 400
+        try:
+            config = detection_config(overrides)
+        except (TypeError, ValueError) as e:
+            return jsonify({'error': str(e)}), 400
+
+        if camera_collection.update_metadata(uid, {'face_detection': overrides}) is None:
+            return jsonify({'error': 'Camera not found'}), 404
+        return jsonify({'uid': uid, 'face_detection': config}), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/cameras/frame_cache', methods=['POST'])
+def set_camera_frame_cache():
+    """
+    Set how different a camera's frame must be before Gemini describes it
+    again: {"uid": "cam1", "threshold": 6}, in dHash bits out of 64. 0 reuses
+    only identical hashes, a negative value turns the cache off for the
+    camera and null restores the default.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        uid = data.get('uid')
+        if not uid or 'threshold' not in data:
+            return jsonify({'error': 'Provide uid and threshold'}), 400
+        try:
+            threshold = check_threshold(data['threshold'], 'threshold')
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        if camera_collection.update_metadata(uid, {'frame_cache_threshold': threshold}) is None:
+            return jsonify({'error': 'Camera not found'}), 404
+        effective = frame_description_cache.threshold if threshold is None else threshold
+        return jsonify({'uid': uid, 'threshold': effective}), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+BATCH_FACE_DOWNLOAD_WORKERS = int(os.getenv("BATCH_FACE_DOWNLOAD_WORKERS", "16"))
+
+
+@app.route('/api/faces/search_batch', methods=['POST'])
+def search_faces_batch():
+    """
+    Look for known faces across many frames: {"cam_urls": [...], "uids": [...],
+    "tolerance": 0.6}. uids are resolved to their cameras' image_url. Frames
+    download concurrently and are detected and encoded in the face process
+    pool; each frame's result is streamed as one NDJSON line as soon as it
+    is ready, followed by a summary line with "done": true.
+    """
+    data = request.get_json(silent=True) or {}
+    cam_urls = data.get('cam_urls') or []
+    uids = data.get('uids') or []
+    if not isinstance(cam_urls, list) or not isinstance(uids, list) or not (cam_urls or uids):
+        return jsonify({'error': 'Provide cam_urls and/or uids as a non-empty list'}), 400
+    try:
+        tolerance = float(data.get('tolerance', DEFAULT_TOLERANCE))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'tolerance must be a number'}), 400
+
+    cameras = camera_collection.get(ids=uids) if uids else {'ids': [], 'metadatas': []}
+    found = dict(zip(cameras['ids'], cameras['metadatas']))
+    try:
+        # (source, detection config) pairs; uids use their camera's settings
+        sources = [({'cam_url': url}, face_detection_settings(data)) for url in cam_urls]
+        missing = []
+        for uid in uids:
+            if uid in found and found[uid].get('image_url'):
+                sources.append(({'uid': uid, 'cam_url': found[uid]['image_url']},
+                                face_detection_settings(data, found[uid])))
+            else:
+                missing.append(uid)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    def generate():
+        for uid in missing:
+            yield json.dumps({'uid': uid, 'error': 'Camera not found'}) + "\n"
+
+        matched = 0
+        pending = {}
+        with ThreadPoolExecutor(max_workers=min(BATCH_FACE_DOWNLOAD_WORKERS, len(sources) or 1)) as downloads:
+            for source, config in sources:
+                pending[downloads.submit(fetch_image_bytes, source['cam_url'])] = ('download', source, config)
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage, source, config = pending.pop(future)
+                    try:
+                        if stage == 'download':
+                            detection = face_pool().submit(detect_faces_bytes, future.result(), config)
+                            pending[detection] = ('detect', source, config)
+                            continue
+                        locations, encodings, skipped = future.result()
+                        faces = identify_faces(face_gallery, locations, encodings, tolerance)
+                        if any(face['name'] for face in faces):
+                            matched += 1
+                        yield json.dumps({**source, 'faces': faces, 'skipped': skipped}) + "\n"
+                    except Exception as e:
+                        yield json.dumps({**source, 'error': f'{stage} failed: {e}'}) + "\n"
+
+        yield json.dumps({'done': True, 'total': len(sources) + len(missing), 'matched_frames': matched}) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
+def _enrollment_images(data):
+    """
+    Reference images of an enrollment request, as bytes: uploaded files
+    (multipart 'images'), base64 strings ('images') and URLs ('image_urls').
+    Returns (images, errors) where errors describe the entries that could not be read.
+    """
+    for field in ('images', 'image_urls'):
+        if data.get(field) and not isinstance(data[field], list):
+            raise ValueError(f'{field} must be a list')
+
+    images, errors = [], []
+    for upload in request.files.getlist('images'):
+        images.append(upload.read())
+
+    for i, encoded in enumerate(data.get('images') or []):
+        try:
+            images.append(base64.b64decode(encoded.split(',', 1)[-1], validate=True))
+        except (ValueError, AttributeError) as e:
+            errors.append({'image': i, 'error': f'Invalid base64 image: {e}'})
+
+    urls = data.get('image_urls') or []
+    if urls:
+        with ThreadPoolExecutor(max_workers=min(8, len(urls))) as pool:
+            futures = {pool.submit(fetch_image_bytes, url): url for url in urls}
+            for future in as_completed(futures):
+                try:
+                    images.append(future.result())
+                except requests.exceptions.RequestException as e:
+                    errors.append({'image_url': futures[future], 'error': f'Download failed: {e}'})
+    return images, errors
+
+
+@app.route('/api/faces/enroll', methods=['POST'])
+def enroll_face():
+    """
+    Enroll reference images for an identity. JSON {"name", "images": [base64],
+    "image_urls": [...]} or multipart with a 'name' field and 'images' files.
+    Images are encoded in the face process pool and swapped into the live
+    gallery at once; matches in flight keep using the previous gallery.
+    """
+    try:
+        data = request.get_json(silent=True) or request.form.to_dict()
+        name = (data.get('name') or '').strip()
+        if not name:
+            return jsonify({'error': 'Missing required parameter: name'}), 400
+
+        images, errors = _enrollment_images(data)
+        if not images:
+            return jsonify({'error': 'No readable images provided', 'failed': errors}), 400
+
+        encoded = []
+        futures = [face_pool().submit(encode_face_bytes, image) for image in images]
+        for image, future in zip(images, futures):
+            try:
+                encoding = future.result()
+            except Exception as e:
+                errors.append({'error': f'Could not encode image: {e}'})
+                continue
+            if encoding is None:
+                errors.append({'error': 'No face found in image'})
+            else:
+                encoded.append((image, encoding))
+        if not encoded:
+            return jsonify({'error': 'No face found in any image', 'failed': errors}), 400
+
+        enrolled = face_gallery.enroll(name, encoded)
+        return jsonify({
+            'name': name,
+            'enrolled': enrolled,
+            'references': face_gallery.references(name),
+            'failed': errors
+        }), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"Error enrolling face: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/faces/remove', methods=['POST'])
+def remove_face():
+    """Remove an identity, or only some of its references: {"name", "references": [ids]}"""
+    try:
+        data = request.get_json(silent=True) or {}
+        name = (data.get('name') or '').strip()
+        if not name:
+            return jsonify({'error': 'Missing required parameter: name'}), 400
+        references = data.get('references')
+        if references is not None and not isinstance(references, list):
+            return jsonify({'error': 'references must be a list'}), 400
+
+        removed = face_gallery.remove(name, references)
+        if not removed:
+            return jsonify({'error': f'No enrolled images for {name}'}), 404
+        return jsonify({
+            'name': name,
+            'removed': removed,
+            'references': face_gallery.references(name)
+        }), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"Error removing face: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+
 # CCTV Stream Management Endpoints
 def validate_m3u8_url(url):
     """Validate if an .m3u8 URL is accessible and returns a valid playlist"""
@@ -743,21 +1424,20 @@ def analyze_cctv_url():
 
 @app.route('/api/get_cctv_streams', methods=['GET'])
 def get_cctv_streams():
-    """Get all stored CCTV stream URLs from camera database"""
+    """Get all stored CCTV stream URLs from camera database (paginated with ?limit=)"""
     try:
-        result = camera_collection.get(include=["metadatas", "documents"])
-        cameras = []
-        
-        for i, metadata in enumerate(result['metadatas']):
-            camera = {
-                'uid': metadata.get('uid'),
+        return _camera_listing(
+            'streams',
+            lambda cam_id, metadata, document: {
+                'uid': cam_id,
                 'stream_url': metadata.get('image_url'),  # Using image_url field for stream URL
-                'description': result['documents'][i] if i < len(result['documents']) else '',
+                'description': document or '',
                 'location': metadata.get('location', '')
-            }
-            cameras.append(camera)
-        
-        return jsonify({'cameras': cameras})
+            },
+            lambda items, next_cursor, paginated: (
+                {'cameras': items, 'next_cursor': next_cursor} if paginated else {'cameras': items}
+            )
+        )
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -1028,12 +1708,18 @@ def fitch_find_agent(task):
 @socketio.on('connect')
 def handle_connect():
     print('Client connected to Trinetra Agent')
-    emit('connection_response', {'status': 'connected'})
+    token = secrets.token_urlsafe(24)
+    with _stream_tokens_lock:
+        _stream_tokens[token] = request.sid
+    emit('connection_response', {'status': 'connected', 'stream_token': token})
 
 
 @socketio.on('disconnect')
 def handle_disconnect():
     print('Client disconnected from Trinetra Agent')
+    with _stream_tokens_lock:
+        for token in [token for token, sid in _stream_tokens.items() if sid == request.sid]:
+            del _stream_tokens[token]
 
 
 @socketio.on('subscribe_agent_updates')
@@ -12,7 +12,8 @@ from httpx import RemoteProtocolError
 from transformers import BlipProcessor, BlipForConditionalGeneration
 from PIL import Image
 from ultralytics import YOLO
-model = YOLO("yolov8n.pt")  # Load YOLOv8 Nano (smallest model)
+YOLO_WEIGHTS = "yolov8n.pt"
+model = YOLO(YOLO_WEIGHTS)  # Load YOLOv8 Nano (smallest model)
 
 #1. Run docker desktop
 
@@ -40,6 +41,19 @@ SUPABASE_ANON_KEY = os.getenv("SUPABASE_ANON_KEY")
 # 3. Create a Supabase client
 supabase: Client = create_client(SUPABASE_URL, SUPABASE_ANON_KEY)
 
+# Optional face identity stage: faces are only looked for inside tracked person boxes,
+# once per new person rather than on every frame
+FACE_IDENTITY_ENABLED = os.getenv("FACE_IDENTITY_ENABLED", "false").lower() in ("1", "true", "yes")
+face_gallery = None
+if FACE_IDENTITY_ENABLED:
+    from face_gallery import FaceGallery
+    from person_faces import PersonFaceIdentifier
+
+    face_gallery = FaceGallery("known_faces", os.path.join(os.getenv("CACHE_DIR", os.path.join("data", "cache")),
+                                                           "face_gallery.npz"))
+    face_gallery.refresh()
+    print(f"✅ Face identity enabled with {len(face_gallery)} known face images")
+
 # 4. Load a pre-trained YOLOv5s model (small version) from Ultralytics
 # model = torch.hub.load('ultralytics/yolov5', 'yolov5s', pretrained=True, force_reload=True)
 model.eval()
@@ -95,6 +109,13 @@ def process_stream(rtsp_url, camera_id, window_name):
     frame_counter = 0
     store_every = 30
 
+    # Tracker state lives on the model, so each stream tracks with its own instance
+    identifier = None
+    stream_model = model
+    if FACE_IDENTITY_ENABLED:
+        identifier = PersonFaceIdentifier(face_gallery)
+        stream_model = YOLO(YOLO_WEIGHTS)
+
     while True:
         ret, frame = cap.read()
         if not ret:
@@ -102,13 +123,17 @@ def process_stream(rtsp_url, camera_id, window_name):
             break
 
         # Run inference on the current frame
-        results = model(frame)  # YOLOv8 returns a list of Results objects
+        if identifier:
+            results = stream_model.track(frame, persist=True, verbose=False)
+        else:
+            results = model(frame)  # YOLOv8 returns a list of Results objects
 
         # Extract detections (bounding boxes, confidences, and class indices)
         boxes = results[0].boxes  # Access the first (and only) Results object
         raw_detections = boxes.xyxy.cpu().numpy()  # Bounding boxes in [x1, y1, x2, y2] format
         confidences = boxes.conf.cpu().numpy()  # Confidence scores
         class_ids = boxes.cls.cpu().numpy()  # Class IDs
+        track_ids = boxes.id.int().cpu().tolist() if identifier and boxes.id is not None else [None] * len(raw_detections)
 
         # Convert raw detections into human-readable format
         readable_detections = []
@@ -127,11 +152,30 @@ def process_stream(rtsp_url, camera_id, window_name):
                     "y2": float(y2)
                 }
             })
+            if track_ids[i] is not None:
+                readable_detections[-1]["track_id"] = track_ids[i]
+
+        # Attach identities to tracked people; only new or unresolved tracks get face work
+        if identifier:
+            people = [det for det in readable_detections if det["label"] == "person" and "track_id" in det]
+            if people:
+                rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                identities = identifier.identify(rgb, people)
+                for det in people:
+                    identity = identities.get(det["track_id"])
+                    if identity is not None:
+                        det["identity"] = {
+                            "name": identity["name"],
+                            "distance": identity["distance"],
+                            "margin": identity["margin"],
+                        }
 
         # Draw bounding boxes on the frame
         for det in readable_detections:
             bbox = det["bbox"]
             label = det["label"]
+            if det.get("identity") and det["identity"]["name"]:
+                label = f"{label}: {det['identity']['name']}"
             confidence = det["confidence"]
             cv2.rectangle(frame, (int(bbox["x1"]), int(bbox["y1"])),
                           (int(bbox["x2"]), int(bbox["y2"])), (0, 255, 0), 2)
@@ -170,6 +214,12 @@ def process_stream(rtsp_url, camera_id, window_name):
                 "frame_url": frame_url,
                 "caption": caption_text
             }
+            if identifier:
+                # Matches travel with the record: each identified person in "results" carries "identity"
+                faces = [det["identity"]["name"] for det in readable_detections
+                         if det.get("identity") and det["identity"]["name"]]
+                if faces:
+                    print(f"{camera_id} - Identified: {', '.join(sorted(set(faces)))}")
             response = supabase.table("inferences").insert(data).execute()
             print(f"{camera_id} - Inserted inference record:", response)
 
@@ -0,0 +1,87 @@
+"""
+Person Face Identification for Trinetra
+Identity for tracked YOLO person boxes: faces are detected and encoded only
+inside person crops, and only until each track has an answer
+"""
+
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from face_gallery import DEFAULT_TOLERANCE, FaceGallery
+from face_pipeline import detect_and_encode, detection_config
+
+# Attempts per track before it is settled as unknown, and frames between attempts
+MAX_ATTEMPTS = int(os.getenv("PERSON_FACE_MAX_ATTEMPTS", "5"))
+RETRY_FRAMES = int(os.getenv("PERSON_FACE_RETRY_FRAMES", "10"))
+# Tracks unseen for this many frames are forgotten
+TRACK_TTL_FRAMES = int(os.getenv("PERSON_FACE_TRACK_TTL", "150"))
+# Person crops are small already; detect on them at full size and upsample for distant faces
+CROP_DETECTION = {"max_side": 0, "upsample": 1, "min_face_px": 24}
+
+
+class PersonFaceIdentifier:
+    """
+    Per-stream track state. identify() is called once per frame with the
+    tracked person boxes; a track gets face work on its first frame and then
+    every RETRY_FRAMES frames until a face matches or MAX_ATTEMPTS frames
+    had no usable face. Settled tracks cost a dict lookup per frame.
+    """
+
+    def __init__(self, gallery: FaceGallery, tolerance: float = DEFAULT_TOLERANCE,
+                 detection: Optional[Dict] = None):
+        self.gallery = gallery
+        self.tolerance = tolerance
+        self.config = detection_config({**CROP_DETECTION, **(detection or {})})
+        self._tracks: Dict[int, Dict] = {}
+        self._frame = 0
+        self.encoded_crops = 0
+
+    def identify(self, frame_rgb: np.ndarray, people: List[Dict]) -> Dict[int, Dict]:
+        """
+        people: [{"track_id": int, "bbox": {"x1", "y1", "x2", "y2"}}] for this frame.
+        Returns {track_id: identity} for every track with an identity so far,
+        where identity is {"name", "distance", "margin", "settled"}.
+        """
+        self._frame += 1
+        height, width = frame_rgb.shape[:2]
+        identities = {}
+        for person in people:
+            track_id = person["track_id"]
+            track = self._tracks.setdefault(track_id, {"attempts": 0, "last_attempt": None, "identity": None})
+            track["last_seen"] = self._frame
+
+            due = track["last_attempt"] is None or self._frame - track["last_attempt"] >= RETRY_FRAMES
+            settled = track["identity"] is not None and track["identity"]["settled"]
+            if not settled and due:
+                track["last_attempt"] = self._frame
+                bbox = person["bbox"]
+                x1, y1 = max(0, int(bbox["x1"])), max(0, int(bbox["y1"]))
+                x2, y2 = min(width, int(bbox["x2"])), min(height, int(bbox["y2"]))
+                if x2 > x1 and y2 > y1:
+                    track["identity"] = self._identify_crop(frame_rgb[y1:y2, x1:x2], track)
+            if track["identity"] is not None:
+                identities[track_id] = track["identity"]
+
+        self._expire()
+        return identities
+
+    def _identify_crop(self, crop: np.ndarray, track: Dict) -> Optional[Dict]:
+        track["attempts"] += 1
+        _, encodings, _ = detect_and_encode(np.ascontiguousarray(crop), self.config)
+        exhausted = track["attempts"] >= MAX_ATTEMPTS
+        if not encodings:
+            return {"name": None, "distance": None, "margin": None, "settled": True} if exhausted else track["identity"]
+
+        self.encoded_crops += 1
+        # One person per crop: keep the closest of any faces found inside it
+        match = min(self.gallery.identify(encodings, self.tolerance),
+                    key=lambda m: float("inf") if m["distance"] is None else m["distance"])
+        return {**match, "settled": match["name"] is not None or exhausted}
+
+    def _expire(self):
+        stale = [track_id for track_id, track in self._tracks.items()
+                 if self._frame - track["last_seen"] > TRACK_TTL_FRAMES]
+        for track_id in stale:
+            del self._tracks[track_id]
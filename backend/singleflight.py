@@ -0,0 +1,76 @@
+"""
+Single-Flight Coalescing for Trinetra
+Concurrent identical calls (same namespace and key) share one execution:
+the first caller runs it, the others wait and get its result or exception
+"""
+
+import threading
+from typing import Any, Callable, Dict, Hashable
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces only calls that overlap in time; nothing is kept once the
+    leader finishes (caching is the caches' job). Counts per namespace how
+    many calls ran ("leaders") and how many rode along ("shared").
+    """
+
+    def __init__(self):
+        self._calls: Dict[tuple, _Call] = {}
+        self._counts: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def do(self, namespace: str, key: Hashable, fn: Callable[[], Any]) -> Any:
+        flight = (namespace, key)
+        with self._lock:
+            counts = self._counts.setdefault(namespace, {"leaders": 0, "shared": 0})
+            call = self._calls.get(flight)
+            leader = call is None
+            if leader:
+                call = self._calls[flight] = _Call()
+                counts["leaders"] += 1
+            else:
+                counts["shared"] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[flight]
+            call.done.set()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            in_flight = {}
+            for namespace, _ in self._calls:
+                in_flight[namespace] = in_flight.get(namespace, 0) + 1
+            stats = {}
+            for namespace, counts in self._counts.items():
+                total = counts["leaders"] + counts["shared"]
+                stats[namespace] = {
+                    **counts,
+                    "in_flight": in_flight.get(namespace, 0),
+                    "shared_ratio": counts["shared"] / total if total else 0.0
+                }
+            return stats
+
+
+# Singleton instance
+inflight = SingleFlight()
@@ -8,10 +8,9 @@ import time
 import re
 from typing import List, Dict, Optional, Callable
 from fitch_marketplace import fitch_marketplace, FitchAgent
-import google.generativeai as genai
 from dotenv import load_dotenv
-import os
 from elasticsearch_integration import get_elasticsearch_manager
+from llm_client import llm_client
 
 load_dotenv()
 
@@ -107,12 +106,8 @@ class TrinetraAgent:
         self.es = get_elasticsearch_manager()  # Elasticsearch for logging
         
     def _init_llm(self):
-        """Initialize Gemini for task decomposition"""
-        api_key = os.getenv("GOOGLE_API_KEY")
-        if api_key:
-            genai.configure(api_key=api_key)
-            return genai.GenerativeModel('gemini-pro')
-        return None
+        """Shared Gemini client for task decomposition, None when no API key is set"""
+        return llm_client if llm_client.configured else None
     
     def process_user_prompt(self, prompt: str, context_id: Optional[str] = None) -> Dict:
         """
@@ -226,8 +221,8 @@ class TrinetraAgent:
         """
         
         try:
-            response = self.llm.generate_content(decomposition_prompt)
-            tasks_json = json.loads(response.text.strip())
+            response_text = self.llm.generate("agent.decompose", decomposition_prompt)
+            tasks_json = json.loads(response_text.strip())
             
             tasks = []
             for t in tasks_json:
@@ -491,14 +486,14 @@ class TrinetraAgent:
             Respond in JSON format matching what the agent would return.
             """
             
-            response = self.llm.generate_content(fallback_prompt)
+            response_text = self.llm.generate("agent.fallback", fallback_prompt)
             
             # Try to parse as JSON, otherwise create structured response
             try:
-                result_data = json.loads(response.text)
+                result_data = json.loads(response_text)
             except:
                 result_data = {
-                    "fallback_response": response.text,
+                    "fallback_response": response_text,
                     "generated_by": "gemini"
                 }
             